@@ -1,12 +1,39 @@
 import os
+import time
+import uuid
+import hashlib
 import streamlit as st
-import matplotlib.pyplot as plt
-from collections import Counter,defaultdict
-from wordcloud import WordCloud
 import nltk
 from nltk.corpus import stopwords
-from src.assemblyai_processing import get_audio_intelligence
+from src.job_coordinator import get_audio_intelligence_shared
+from src.job_service import JobQueue
+from src.parallel_transcription import SEGMENT_SECONDS, LAST_SEGMENT_FRACTION
+from src.assemblyai_processing import process_transcription_data
 from src.rag_system import initialize_rag_system
+from src.transcript_store import ARCHIVE_DIR, ARCHIVE_EXTENSION, TranscriptArchive, load_transcript, save_transcript
+from src.tracing import span, begin_trace, end_trace, recent_spans
+from src.analytics import (
+    CONFIDENCE_THRESHOLD,
+    entity_counts,
+    group_entities,
+    sentiment_distribution,
+    filter_topics,
+    content_safety_scores,
+    speaking_time_distribution
+)
+from src.conversation_dynamics import conversation_dynamics
+from src.dashboard_figures import (
+    speaking_time_figure,
+    entity_frequency_figure,
+    entity_wordcloud_figure,
+    conversation_flow_figure,
+    topic_figure,
+    sentiment_figure,
+    content_safety_figure,
+    talk_ratio_figure,
+    rolling_sentiment_figure,
+    turn_taking_figure
+)
 
 # Basic configuration for the Streamlit application interface
 st.set_page_config(
@@ -88,27 +115,28 @@ def format_duration(milliseconds):
     else:
         return f"{minutes}m {remaining_seconds}s"
 
-def extract_keywords(text, entities):
+# Stores an uploaded file under data/raw exactly once
+def save_upload(uploaded_file):
     """
-    Analyzes text to count occurrences of detected entities.
-    Returns frequency count of entities found in the text.
+    Writes the upload to data/raw, named after the hash of its contents, and returns the path. The file is written
+    to a temporary name and renamed, so the job service never reads a half written file. Reruns reuse the path.
     """
-    # Create a dictionary of all entities and their variations
-    entity_dict = {}
-    for entity in entities:
-        # Use the entity text as key and store its type
-        entity_dict[entity["text"].lower()] = entity["entity_type"]
-    
-    # Count occurrences of entities in text
-    words = text.lower().split()
-    entity_counts = Counter()
-    
-    # Look for entities in the text
-    for word in words:
-        if word in entity_dict:
-            entity_counts[word] += 1
-            
-    return entity_counts
+    upload_key = (uploaded_file.name, uploaded_file.size)
+    if st.session_state.get("raw_upload") == upload_key:
+        return st.session_state.raw_audio_path
+
+    contents = uploaded_file.getbuffer()
+    raw_directory = os.path.join("data", "raw")
+    os.makedirs(raw_directory, exist_ok=True)
+    raw_audio_path = os.path.join(raw_directory, hashlib.sha256(contents).hexdigest() + os.path.splitext(uploaded_file.name)[1])
+    if not os.path.exists(raw_audio_path):
+        temp_path = f"{raw_audio_path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(contents)
+        os.replace(temp_path, raw_audio_path)
+    st.session_state.raw_upload = upload_key
+    st.session_state.raw_audio_path = raw_audio_path
+    return raw_audio_path
 
 # Custom dark theme
 st.markdown(
@@ -255,25 +283,110 @@ st.write("Ask questions about the conversation once that's done!")
 # File upload section:
 uploaded_file = st.file_uploader("Choose an audio file...", type=["mp3"])
 
-if uploaded_file is not None:
-    # Create data/raw directory if it doesn't exist
-    os.makedirs(os.path.join("data", "raw"), exist_ok=True)
-    
-    raw_audio_path = os.path.join("data", "raw", uploaded_file.name)
-    with open(raw_audio_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    st.success(f"File '{uploaded_file.name}' uploaded successfully!")
+# Shrinking the file locally (mono, 16kHz, low bitrate, silence trimmed) speeds up the upload of long recordings
+preprocess_audio = st.sidebar.checkbox("Compress audio before upload", value=False,
+                                       help="Requires ffmpeg to be installed, the original file is uploaded without it. "
+                                            "The transcript timestamps still match the original recording")
+# Long recordings can be split at silences and transcribed as several jobs at once
+split_audio = st.sidebar.checkbox("Split long recordings into parallel jobs", value=False,
+                                  help=f"Requires ffmpeg to be installed. Recordings up to "
+                                       f"{SEGMENT_SECONDS * (1 + LAST_SEGMENT_FRACTION) / 60:g} minutes are sent as a single job")
+# Timings of every pipeline stage in this run, the spans are also exported when SPEAKERLENS_TRACE_FILE is set
+show_debug_panel = st.sidebar.checkbox("Show debug panel", value=False)
+# Hands the transcription to the job service so the page stays responsive, the job survives page refreshes
+active_job = st.query_params.get("job")
+use_job_service = st.sidebar.checkbox("Process in the background", value=active_job is not None,
+                                      help="Requires the job service to be running: python -m src.job_service")
+# How often the page checks on a background job
+JOB_POLL_SECONDS = 3
+
+# Archived meetings open straight from disk, optionally only a time range of them
+archived_meetings = sorted(
+    name for name in os.listdir(ARCHIVE_DIR) if name.endswith(ARCHIVE_EXTENSION)
+) if os.path.isdir(ARCHIVE_DIR) else []
+archived_meeting = st.sidebar.selectbox("Open an archived meeting", [None, *archived_meetings],
+                                        format_func=lambda name: "None" if name is None else name)
+archive_range = (None, None)
+if archived_meeting:
+    with TranscriptArchive(os.path.join(ARCHIVE_DIR, archived_meeting)) as archive:
+        _, archive_end = archive.time_range()
+    total_minutes = max(1, -(-archive_end // 60000))
+    start_minute, end_minute = st.sidebar.slider("Time range (minutes)", 0, total_minutes, (0, total_minutes))
+    if (start_minute, end_minute) != (0, total_minutes):
+        archive_range = (start_minute * 60000, end_minute * 60000)
+
+# Every run of this script is one trace, every pipeline stage below is a span inside it
+trace = begin_trace("app_run")
+
+if uploaded_file is not None or archived_meeting or (use_job_service and active_job):
+    upload_key = (uploaded_file.name, uploaded_file.size) if uploaded_file is not None else None
+    job_submitted = use_job_service and upload_key is not None and st.session_state.get("job_upload") == upload_key
+    if uploaded_file is not None:
+        # Written once per upload, not on every rerun (and not at all once its background job exists)
+        if not job_submitted:
+            raw_audio_path = save_upload(uploaded_file)
+        st.success(f"File '{uploaded_file.name}' uploaded successfully!")
+
+    embedded_chunks = None
+    if use_job_service and not archived_meeting:
+        job_queue = JobQueue()
+        # Every uploaded file is submitted once, reruns and page refreshes pick up the job ID from the URL
+        if upload_key is not None and not job_submitted:
+            active_job = job_queue.submit(raw_audio_path, preprocess=preprocess_audio, split=split_audio)
+            st.session_state.job_upload = upload_key
+            st.query_params["job"] = active_job
+
+        job = job_queue.get(active_job)
+        if job is None:
+            st.error("The background job could not be found, please upload the file again.")
+            del st.query_params["job"]
+            st.stop()
+        if job["status"] == "failed":
+            st.error(f"Error during audio analysis: {job['error']}")
+            st.stop()
+        if job["status"] != "completed":
+            st.info(f"Job {active_job[:8]} is {job['stage']}... This page updates automatically, "
+                    "you can also close it and come back later using the same link.")
+            end_trace(trace)
+            time.sleep(JOB_POLL_SECONDS)
+            st.rerun()
+        embedded_chunks = job_queue.load_result(active_job, "embeddings")
 
     st.header("📝 Full Transcription and Speaker-Specific Highlights")
     try:
-        # Retrieves analysis results from audio processing including all features
-        transcription, speakers, summary, entities, sentiment_analysis, topics, content_safety, transcript_data = get_audio_intelligence(raw_audio_path)
+        # Retrieves analysis results from audio processing including all features.
+        # Identical recordings are transcribed only once, other sessions (and reruns) reuse the same job.
+        if archived_meeting:
+            with span("archive_load", meeting=archived_meeting, start_ms=archive_range[0], end_ms=archive_range[1]):
+                archived_data = load_transcript(os.path.join(ARCHIVE_DIR, archived_meeting), *archive_range)
+            transcription, speakers, summary, entities, sentiment_analysis, topics, content_safety, transcript_data = process_transcription_data(
+                archived_data
+            )
+        elif use_job_service:
+            transcription, speakers, summary, entities, sentiment_analysis, topics, content_safety, transcript_data = process_transcription_data(
+                job_queue.load_result(active_job)
+            )
+        else:
+            transcription, speakers, summary, entities, sentiment_analysis, topics, content_safety, transcript_data = get_audio_intelligence_shared(
+                raw_audio_path, preprocess=preprocess_audio, split=split_audio
+            )
+
+        # Keeps the analysed meeting in the compact archive format so it can be reopened later without any API calls
+        if not archived_meeting and st.sidebar.button("Archive this meeting"):
+            meeting_name = os.path.splitext(uploaded_file.name)[0] if uploaded_file is not None else transcript_data["id"]
+            archive_path = os.path.join(ARCHIVE_DIR, meeting_name + ARCHIVE_EXTENSION)
+            archive_bytes = save_transcript(transcript_data, archive_path)
+            st.sidebar.success(f"Archived as {os.path.basename(archive_path)} ({archive_bytes / 1024:.0f} KB)")
 
         # Assign colors to speakers
         speaker_colors = assign_speaker_colors(speakers)
 
-        # Confidence threshold for topic relevance filtering, this can be changed as per requirements
-        CONFIDENCE_THRESHOLD = 0.5
+        # The confidence threshold for topic relevance filtering lives in src/analytics.py
+        with span("dashboard_analytics"):
+            overall_entities, speaker_entities = entity_counts(speakers, entities)
+            significant_topics = filter_topics(topics, CONFIDENCE_THRESHOLD)
+            # Talk ratio, turn-taking and rolling sentiment per time window, see src/conversation_dynamics.py
+            dynamics = conversation_dynamics(transcript_data["utterances"], sentiment_analysis, list(speakers))
 
         # Create main dashboard tabs
         st.header("📊 Analytics Dashboard")
@@ -287,7 +400,7 @@ if uploaded_file is not None:
         ])
 
         # Tab 1: Transcript View
-        with dashboard_tabs[0]:
+        with dashboard_tabs[0], span("render_tab", tab="transcript"):
             transcript_view = st.tabs([
                 "Line by Line",
                 "Full Transcript"
@@ -310,7 +423,7 @@ if uploaded_file is not None:
                 st.markdown(f"<div class='box'>{transcription}</div>", unsafe_allow_html=True)
 
         # Tab 2: Speaker Analysis
-        with dashboard_tabs[1]:
+        with dashboard_tabs[1], span("render_tab", tab="speaker_analysis"):
             st.subheader("Speaker Analysis")
             
             # Speaker Legend
@@ -322,17 +435,17 @@ if uploaded_file is not None:
             
             # Speaker Metrics
             with st.expander("📊 Speaking Time Distribution", expanded=True):
-                total_duration = sum(data["duration"] for data in speakers.values())
-                speaking_times = {speaker: (data["duration"] / total_duration) * 100 
-                                for speaker, data in speakers.items()}
-                fig, ax = plt.subplots(figsize=(10, 6))
-                plt.pie(speaking_times.values(), 
-                       labels=[f"{speaker}\n({percentage:.1f}%)" 
-                              for speaker, percentage in speaking_times.items()],
-                       colors=[speaker_colors[speaker] for speaker in speaking_times.keys()],
-                       autopct='%1.1f%%')
-                plt.title("Speaking Time Distribution")
-                st.pyplot(fig)
+                speaking_times = speaking_time_distribution(speakers)
+                st.pyplot(speaking_time_figure(speaking_times, speaker_colors))
+
+            with st.expander("⏱️ Talk Ratio Over Time"):
+                st.pyplot(talk_ratio_figure(dynamics["talk_ratio"], speaker_colors))
+
+            with st.expander("🗣️ Turn-Taking & Interruptions"):
+                st.pyplot(turn_taking_figure(dynamics["speakers"], speaker_colors))
+                st.dataframe(dynamics["speakers"])
+                st.markdown("Interruptions by speaker (rows) of speaker (columns):")
+                st.dataframe(dynamics["interruptions"])
 
             # Individual Speaker Transcripts
             with st.expander("📝 Speaker-Specific Transcripts"):
@@ -346,7 +459,7 @@ if uploaded_file is not None:
                     )
 
         # Tab 3: Entity Insights
-        with dashboard_tabs[2]:
+        with dashboard_tabs[2], span("render_tab", tab="entity_insights"):
             st.subheader("Entity Analysis")
             
             entity_tabs = st.tabs([
@@ -357,27 +470,16 @@ if uploaded_file is not None:
             
             with entity_tabs[0]:
                 st.markdown("### Most Mentioned Entities")
-                all_text = " ".join(data["text"] for data in speakers.values())
-                overall_entities = extract_keywords(all_text, entities)
                 most_common_entities = overall_entities.most_common(10)
                 if most_common_entities:
-                    entities_words, counts = zip(*most_common_entities)
-                    fig, ax = plt.subplots()
-                    ax.barh(entities_words, counts, color="#88B04B")
-                    ax.set_xlabel("Frequency")
-                    st.pyplot(fig)
+                    st.pyplot(entity_frequency_figure(most_common_entities))
             
             with entity_tabs[1]:
                 for speaker, data in speakers.items():
                     with st.expander(f"🎤 {speaker}'s Entities"):
-                        speaker_entities = extract_keywords(data["text"], entities)
-                        common_entities = speaker_entities.most_common(5)
+                        common_entities = speaker_entities[speaker].most_common(5)
                         if common_entities:
-                            entities_words, counts = zip(*common_entities)
-                            fig, ax = plt.subplots()
-                            ax.barh(entities_words, counts, color=speaker_colors[speaker])
-                            ax.set_xlabel("Frequency")
-                            st.pyplot(fig)
+                            st.pyplot(entity_frequency_figure(common_entities, speaker_colors[speaker]))
             
             with entity_tabs[2]:
                 # Your existing word clouds
@@ -386,50 +488,23 @@ if uploaded_file is not None:
                     st.markdown("### Overall Entity Cloud")
                     wordcloud_dict = dict(overall_entities)
                     if wordcloud_dict:
-                        wordcloud = WordCloud(width=400, height=200, 
-                                            background_color="black", 
-                                            colormap="Pastel1").generate_from_frequencies(wordcloud_dict)
-                        plt.figure(figsize=(10, 5))
-                        plt.imshow(wordcloud, interpolation="bilinear")
-                        plt.axis("off")
-                        st.pyplot(plt)
+                        st.pyplot(entity_wordcloud_figure(wordcloud_dict))
 
         # Tab 4: Advanced Analytics
-        with dashboard_tabs[3]:
+        with dashboard_tabs[3], span("render_tab", tab="advanced_analytics"):
             st.subheader("Advanced Insights")
             
             with st.expander("🔄 Conversation Flow", expanded=True):
-                fig, ax = plt.subplots(figsize=(12, 6))
                 speakers_list = list(speakers.keys())
-                for i, utterance in enumerate(transcript_data["utterances"]):
-                    speaker_idx = speakers_list.index(utterance["speaker"])
-                    start_time = utterance["start"] / 1000
-                    duration = (utterance["end"] - utterance["start"]) / 1000
-                    ax.barh(y=speaker_idx, 
-                           width=duration, 
-                           left=start_time, 
-                           color=speaker_colors[utterance["speaker"]],
-                           alpha=0.7)
-                ax.set_yticks(range(len(speakers_list)))
-                ax.set_yticklabels(speakers_list)
-                ax.set_xlabel("Time (seconds)")
-                ax.set_title("Conversation Flow Timeline")
-                st.pyplot(fig)
+                st.pyplot(conversation_flow_figure(transcript_data["utterances"], speakers_list, speaker_colors))
             
             with st.expander("📊 Topic Distribution"):
                 if topics:
-                    significant_topics = {k: v for k, v in topics.items() 
-                                       if v > CONFIDENCE_THRESHOLD}
                     if significant_topics:
-                        fig, ax = plt.subplots(figsize=(10, 6))
-                        plt.barh(list(significant_topics.keys()), 
-                                list(significant_topics.values()))
-                        plt.xlabel('Confidence Score')
-                        plt.title('Topic Distribution')
-                        st.pyplot(fig)
+                        st.pyplot(topic_figure(significant_topics))
 
         # Tab 5: Summary & Analysis
-        with dashboard_tabs[4]:
+        with dashboard_tabs[4], span("render_tab", tab="summary_analysis"):
             st.subheader("Summary & Analysis")
             
             analysis_tabs = st.tabs([
@@ -448,37 +523,22 @@ if uploaded_file is not None:
             # Entities Tab
             with analysis_tabs[1]:
                 st.markdown("### 🔍 Entities Detected")
-                grouped_entities = defaultdict(list)
-                for entity in entities:
-                    grouped_entities[entity["entity_type"]].append(entity["text"])
+                grouped_entities = group_entities(entities)
                 
-                for category, items in grouped_entities.items():
+                for category, unique_items in grouped_entities.items():
                     with st.expander(f"{category.capitalize()}"):
-                        unique_items = list(set(items))  # Remove duplicates
                         st.write(", ".join(unique_items))
             
             # Sentiment Tab
             with analysis_tabs[2]:
                 st.markdown("### 💭 Sentiment Analysis")
-                sentiments_summary = {}
-                for sentiment in sentiment_analysis:
-                    sentiment_type = sentiment["sentiment"]
-                    sentiments_summary[sentiment_type] = sentiments_summary.get(sentiment_type, 0) + 1
+                sentiments_summary = sentiment_distribution(sentiment_analysis)
                 
                 # Create a pie chart for sentiment distribution
                 if sentiments_summary:
-                    fig, ax = plt.subplots(figsize=(8, 6))
-                    colors = {
-                        'POSITIVE': '#90EE90',
-                        'NEUTRAL': '#F0E68C',
-                        'NEGATIVE': '#FFB6C1'
-                    }
-                    plt.pie(sentiments_summary.values(),
-                           labels=[f"{k}\n({v} occurrences)" for k, v in sentiments_summary.items()],
-                           colors=[colors.get(k, '#808080') for k in sentiments_summary.keys()],
-                           autopct='%1.1f%%')
-                    plt.title("Sentiment Distribution")
-                    st.pyplot(fig)
+                    st.pyplot(sentiment_figure(sentiments_summary))
+                    st.pyplot(rolling_sentiment_figure(dynamics["sentiment"], speaker_colors,
+                                                       dynamics["overall_sentiment"]))
                 
                 st.markdown(
                     "<div class='box'>" +
@@ -491,22 +551,11 @@ if uploaded_file is not None:
             with analysis_tabs[3]:
                 st.markdown("### 📚 Relevant Topics")
                 if topics:
-                    filtered_topics = {topic: confidence 
-                                     for topic, confidence in topics.items() 
-                                     if confidence > CONFIDENCE_THRESHOLD}
-                    if filtered_topics:
+                    if significant_topics:
                         # Create bar chart for topic confidence
-                        fig, ax = plt.subplots(figsize=(10, 6))
-                        topics_sorted = dict(sorted(filtered_topics.items(), 
-                                                  key=lambda x: x[1], 
-                                                  reverse=True))
-                        plt.barh(list(topics_sorted.keys()), 
-                                list(topics_sorted.values()))
-                        plt.xlabel('Confidence Score')
-                        plt.title('Topic Detection Confidence')
-                        st.pyplot(fig)
+                        st.pyplot(topic_figure(significant_topics, 'Topic Detection Confidence'))
                         
-                        for topic, confidence in topics_sorted.items():
+                        for topic, confidence in significant_topics.items():
                             st.markdown(
                                 f"<div class='box'>Topic: <b>{topic}</b>, "
                                 f"Confidence: {confidence:.2f}</div>",
@@ -521,37 +570,18 @@ if uploaded_file is not None:
             with analysis_tabs[4]:
                 st.markdown("### ⚠️ Content Safety Analysis")
                 if content_safety:
-                    safety_categories = {
-                        "hate_speech": "Hate Speech",
-                        "insult": "Insults",
-                        "profanity": "Profanity",
-                        "threat": "Threats",
-                        "self_harm": "Self-Harm References",
-                        "sexual": "Sexual Content",
-                        "violence": "Violence"
-                    }
-                    
                     # Create bar chart for safety metrics
-                    fig, ax = plt.subplots(figsize=(10, 6))
-                    safety_data = {safety_categories[k]: v 
-                                 for k, v in content_safety.items() 
-                                 if k in safety_categories}
+                    safety_data = content_safety_scores(content_safety, CONFIDENCE_THRESHOLD)
                     if safety_data:
-                        plt.barh(list(safety_data.keys()), 
-                                list(safety_data.values()))
-                        plt.xlabel('Confidence Score')
-                        plt.title('Content Safety Analysis')
-                        st.pyplot(fig)
+                        st.pyplot(content_safety_figure(safety_data))
                     
-                    for category, label in safety_categories.items():
-                        if category in content_safety:
-                            confidence = content_safety[category]
-                            color = "#FF6B6B" if confidence > CONFIDENCE_THRESHOLD else "#4CAF50"
-                            st.markdown(
-                                f"<div class='box' style='background-color: {color};'>"
-                                f"{label}: {confidence:.1%} confidence</div>",
-                                unsafe_allow_html=True
-                            )
+                    for label, score in safety_data.items():
+                        color = "#FF6B6B" if score["flagged"] else "#4CAF50"
+                        st.markdown(
+                            f"<div class='box' style='background-color: {color};'>"
+                            f"{label}: {score['confidence']:.1%} confidence</div>",
+                            unsafe_allow_html=True
+                        )
                 else:
                     st.write("No content safety concerns detected.")
 
@@ -561,12 +591,20 @@ if uploaded_file is not None:
          # RAG-based Chat Interface that implements a simple RAG pipeline.
         st.header("💬 Chat with Your Transcript")
         
-        # Initialize session state
-        if "rag_system" not in st.session_state:
-            rag, qa_chain = initialize_rag_system(transcription, speakers)
-            st.session_state.rag_system = rag
-            st.session_state.qa_chain = qa_chain
-            st.session_state.chat_history = []
+        # Initialize session state, the RAG system is built once per meeting (or time range of an archived one)
+        rag_source = (transcript_data.get("id"), archived_meeting, archive_range)
+        rag_cached = "rag_system" in st.session_state and st.session_state.get("rag_source") == rag_source
+        with span("rag_session", cache="hit" if rag_cached else "miss"):
+            if not rag_cached:
+                if "rag_system" in st.session_state:
+                    # Drop the previous transcript's chunks so they don't show up in answers about this one
+                    st.session_state.rag_system.close()
+                # Background jobs come with the chunk embeddings already computed
+                rag, qa_chain = initialize_rag_system(transcription, speakers, embedded_chunks)
+                st.session_state.rag_system = rag
+                st.session_state.qa_chain = qa_chain
+                st.session_state.chat_history = []
+                st.session_state.rag_source = rag_source
 
         # Chat interface
         user_question = st.text_input(
@@ -609,4 +647,18 @@ if uploaded_file is not None:
                 st.markdown("---")
 
     except Exception as e:
-        st.error(f"Error during audio analysis: {e}")
\ No newline at end of file
+        st.error(f"Error during audio analysis: {e}")
+
+end_trace(trace)
+
+# Optional debug panel with the timings of every stage of this run
+if show_debug_panel:
+    with st.expander("🐞 Debug: Pipeline Timings", expanded=True):
+        spans = recent_spans(trace.trace_id)
+        if spans:
+            st.dataframe([
+                {"stage": s["name"], "duration_ms": s["duration_ms"], **s["attributes"]}
+                for s in sorted(spans, key=lambda s: s["start_time"])
+            ])
+        else:
+            st.write("Nothing has been traced in this run yet.")
\ No newline at end of file
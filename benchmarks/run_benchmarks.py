@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import glob
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+
+import matplotlib
+matplotlib.use("Agg")  # Figures are rendered off-screen
+import matplotlib.pyplot as plt
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from benchmarks.synthetic_transcripts import generate_transcript_data
+from src.assemblyai_processing import process_transcription_data
+from src.rag_system import TranscriptRAG
+from src.corpus_index import CorpusIndex
+from src.transcript_store import TranscriptArchive, save_transcript, load_transcript
+from src import analytics
+from src import tracing
+from src import dashboard_figures
+from src.conversation_dynamics import conversation_dynamics
+
+# Recording lengths (in hours) every benchmark is run at
+SCALES = {"10min": 1 / 6, "1h": 1.0, "8h": 8.0}
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+# A benchmark counts as a regression when it gets this much slower than the previous run at the same scale,
+# and by at least NOISE_FLOOR_MS (sub-millisecond timings move by more than 20% from run to run on their own)
+REGRESSION_THRESHOLD = 0.2
+NOISE_FLOOR_MS = 1.0
+
+QUESTIONS = [
+    "What did the team decide about the budget?",
+    "Who talked about the release timeline?",
+    "What are the main risks for next quarter?",
+    "When was Acme mentioned?"
+]
+
+class FakeLLM:
+    """
+    Stands in for ChatOpenAI so TranscriptRAG can be built without an API key. Generation isn't benchmarked.
+    """
+
+def timed(function, repeat):
+    """
+    Runs a function `repeat` times and returns its timings in milliseconds along with the last result.
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "repeat": repeat
+    }, result
+
+def figure_benchmark(build_figure):
+    """
+    Builds a figure and renders it to PNG the way st.pyplot does, then frees it.
+    """
+    def run():
+        fig = build_figure()
+        fig.savefig(os.devnull, format="png")
+        plt.close(fig)
+    return run
+
+def run_scale(hours, repeat, embedding_size, skip_rag):
+    transcript_data = generate_transcript_data(hours=hours)
+    results = {}
+
+    def bench(name, function, times=repeat):
+        results[name], value = timed(function, times)
+        return value
+
+    processed = bench("process_transcription_data", lambda: process_transcription_data(transcript_data))
+    _, speakers, _, entities, sentiment_analysis, topics, content_safety, _ = processed
+    all_text = " ".join(data["text"] for data in speakers.values())
+
+    # Dashboard computations
+    bench("extract_keywords", lambda: analytics.extract_keywords(all_text, entities))
+    overall_entities, speaker_entities = bench("entity_counts", lambda: analytics.entity_counts(speakers, entities))
+    speaking_times = bench("speaking_time_distribution", lambda: analytics.speaking_time_distribution(speakers))
+    bench("group_entities", lambda: analytics.group_entities(entities))
+    sentiments_summary = bench("sentiment_distribution", lambda: analytics.sentiment_distribution(sentiment_analysis))
+    significant_topics = bench("filter_topics", lambda: analytics.filter_topics(topics))
+    safety_data = bench("content_safety_scores", lambda: analytics.content_safety_scores(content_safety))
+    dynamics = bench("conversation_dynamics", lambda: conversation_dynamics(
+        transcript_data["utterances"], sentiment_analysis, list(speakers)))
+    bench("analyze_transcript", lambda: analytics.analyze_transcript(transcript_data))
+
+    # Dashboard figures, each one is rendered just like the app would
+    speaker_colors = {speaker: color for speaker, color in zip(speakers, plt.cm.tab10.colors)}
+    figure_cases = {
+        "figure_speaking_time": lambda: dashboard_figures.speaking_time_figure(speaking_times, speaker_colors),
+        "figure_entity_frequency": lambda: dashboard_figures.entity_frequency_figure(overall_entities.most_common(10)),
+        "figure_entity_wordcloud": lambda: dashboard_figures.entity_wordcloud_figure(dict(overall_entities)),
+        "figure_conversation_flow": lambda: dashboard_figures.conversation_flow_figure(
+            transcript_data["utterances"], list(speakers.keys()), speaker_colors),
+        "figure_topics": lambda: dashboard_figures.topic_figure(significant_topics),
+        "figure_sentiment": lambda: dashboard_figures.sentiment_figure(sentiments_summary),
+        "figure_content_safety": lambda: dashboard_figures.content_safety_figure(safety_data),
+        "figure_talk_ratio": lambda: dashboard_figures.talk_ratio_figure(dynamics["talk_ratio"], speaker_colors),
+        "figure_rolling_sentiment": lambda: dashboard_figures.rolling_sentiment_figure(
+            dynamics["sentiment"], speaker_colors, dynamics["overall_sentiment"]),
+        "figure_turn_taking": lambda: dashboard_figures.turn_taking_figure(dynamics["speakers"], speaker_colors)
+    }
+    for name, build_figure in figure_cases.items():
+        # The conversation flow draws one bar per utterance and gets slow on long recordings
+        bench(name, figure_benchmark(build_figure), times=1 if name == "figure_conversation_flow" else repeat)
+
+    # Storage: the raw JSON against the compact archive format, including opening a 10 minute slice of it
+    with tempfile.TemporaryDirectory() as temp_dir:
+        json_path = os.path.join(temp_dir, "transcript.json")
+        archive_path = os.path.join(temp_dir, "transcript.sltr")
+
+        def save_json():
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(transcript_data, f)
+
+        def load_json():
+            with open(json_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        bench("json_save", save_json, times=1)
+        bench("json_load", load_json)
+        bench("archive_save", lambda: save_transcript(transcript_data, archive_path), times=1)
+        bench("archive_load", lambda: load_transcript(archive_path))
+        bench("archive_slice_10min", lambda: load_transcript(archive_path, 0, 10 * 60 * 1000))
+        with TranscriptArchive(archive_path) as archive:
+            bench("archive_utterance_table", lambda: archive.table("utterances"))
+        storage = {"json_bytes": os.path.getsize(json_path), "archive_bytes": os.path.getsize(archive_path)}
+
+    if not skip_rag:
+        rag = TranscriptRAG(embeddings=DeterministicFakeEmbedding(size=embedding_size), llm=FakeLLM())
+        documents = bench("rag_prepare_documents", lambda: rag.prepare_documents(processed[0], speakers))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            vector_store = bench("rag_create_vector_store",
+                                 lambda: rag.create_vector_store(documents, persist_directory=temp_dir), times=1)
+            retriever = vector_store.as_retriever(search_kwargs={"k": 4})
+            bench("rag_retrieval", lambda: [retriever.invoke(question) for question in QUESTIONS])
+            results["rag_retrieval"]["queries"] = len(QUESTIONS)
+        results["rag_prepare_documents"]["chunks"] = len(documents)
+
+    return {
+        "hours": hours,
+        "utterances": len(transcript_data["utterances"]),
+        "words": len(transcript_data["words"]),
+        "entities": len(entities),
+        "sentiment_results": len(sentiment_analysis),
+        "storage": storage,
+        "benchmarks": results
+    }
+
+def run_corpus(chunks, repeat, embedding_size):
+    """
+    Searches a cross-meeting corpus index of about `chunks` chunks, built from distinct synthetic one hour
+    meetings spread over a few years, without a filter and restricted to a date range.
+    """
+    rag = TranscriptRAG(embeddings=DeterministicFakeEmbedding(size=embedding_size), llm=FakeLLM())
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index = CorpusIndex(temp_dir, rag=rag)
+        indexed = 0
+        build_start = time.perf_counter()
+        while indexed < chunks:
+            meeting = len(index.meetings)
+            transcription, speakers, *_ = process_transcription_data(generate_transcript_data(hours=1.0, seed=meeting))
+            date = f"{2022 + meeting % 3}-{meeting % 12 + 1:02d}-{meeting % 28 + 1:02d}"
+            indexed += index.add_meeting(f"meeting-{meeting:05d}", transcription, speakers, date=date)
+        build_seconds = time.perf_counter() - build_start
+
+        def bench(name, **filters):
+            results[name], _ = timed(lambda: [index.search(question, **filters) for question in QUESTIONS], repeat)
+            results[name]["queries"] = len(QUESTIONS)
+
+        bench("corpus_search")
+        bench("corpus_search_date_range", date_from="2023-01-01", date_to="2023-06-30")
+    return {"chunks": indexed, "meetings": len(index.meetings), "build_seconds": round(build_seconds, 1),
+            "benchmarks": results}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(current, previous_runs, threshold=REGRESSION_THRESHOLD, noise_floor_ms=NOISE_FLOOR_MS):
+    """
+    Lists every benchmark that got more than `threshold` slower than in the newest of previous_runs (newest first)
+    with the same scale and embedding size. Only benchmarks that were run more than once in both runs are compared,
+    and even the fastest of the new timings has to be that much slower than the previous median, so a single
+    slow sample doesn't get flagged.
+    """
+    regressions = []
+    for scale, scale_results in current["scales"].items():
+        previous = next((run for run in previous_runs
+                         if run.get("embedding_size") == current["embedding_size"] and scale in run.get("scales", {})
+                         and run["scales"][scale].get("hours") == scale_results.get("hours")), None)
+        if previous is None:
+            continue
+        previous_scale = previous["scales"][scale]["benchmarks"]
+        for name, timing in scale_results["benchmarks"].items():
+            before = previous_scale.get(name)
+            if not before or timing["repeat"] < 2 or before.get("repeat", 1) < 2:
+                continue
+            before_ms = before["median_ms"]
+            if timing["min_ms"] > before_ms * (1 + threshold) and timing["min_ms"] - before_ms >= noise_floor_ms:
+                regressions.append({"scale": scale, "benchmark": name, "before_ms": before_ms,
+                                    "after_ms": timing["median_ms"], "change": round(timing["median_ms"] / before_ms - 1, 3),
+                                    "previous_run": previous["timestamp"]})
+    return regressions
+
+def main(argv=None):
+    """
+    Command line entry point, e.g. `python -m benchmarks.run_benchmarks --scales 10min,1h`
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the SpeakerLens pipeline on synthetic transcripts.")
+    parser.add_argument("--scales", default=",".join(SCALES), help=f"Comma separated subset of {', '.join(SCALES)}")
+    parser.add_argument("--repeat", type=int, default=5, help="How many times every benchmark is run")
+    parser.add_argument("--embedding-size", type=int, default=1536, help="Size of the fake embeddings")
+    parser.add_argument("--skip-rag", action="store_true", help="Skip the chunking, indexing and retrieval benchmarks")
+    parser.add_argument("--corpus-chunks", type=int, default=100_000,
+                        help="Size of the cross-meeting corpus searched by the corpus benchmarks, 0 to skip them")
+    parser.add_argument("--output-dir", default=RESULTS_DIR)
+    args = parser.parse_args(argv)
+    # Spans are still timed and kept in memory, but exporting them would add file writes to every benchmark
+    tracing.set_trace_file(None)
+
+    run = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "embedding_size": args.embedding_size,
+        "scales": {}
+    }
+    for scale in args.scales.split(","):
+        print(f"Running benchmarks at the {scale} scale...")
+        run["scales"][scale] = run_scale(SCALES[scale], args.repeat, args.embedding_size, args.skip_rag)
+        for name, timing in run["scales"][scale]["benchmarks"].items():
+            print(f"  {name:<32} {timing['median_ms']:>12.2f} ms")
+    if args.corpus_chunks and not args.skip_rag:
+        # Recorded like a scale, so it's only compared with runs over a corpus of the same size
+        scale = f"corpus-{args.corpus_chunks}"
+        print(f"Running the corpus benchmarks over {args.corpus_chunks} chunks...")
+        run["scales"][scale] = run_corpus(args.corpus_chunks, args.repeat, args.embedding_size)
+        for name, timing in run["scales"][scale]["benchmarks"].items():
+            print(f"  {name:<32} {timing['median_ms']:>12.2f} ms ({timing['queries']} queries)")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    previous_runs = []
+    for path in sorted(glob.glob(os.path.join(args.output_dir, "*.json")), reverse=True):
+        with open(path, "r", encoding="utf-8") as f:
+            previous_runs.append(json.load(f))
+    if args.repeat < 2:
+        print("Not checking for regressions, that needs --repeat 2 or more.")
+    elif previous_runs:
+        run["regressions"] = compare(run, previous_runs)
+        for regression in run["regressions"]:
+            print(f"REGRESSION [{regression['scale']}] {regression['benchmark']}: "
+                  f"{regression['before_ms']:.2f} ms -> {regression['after_ms']:.2f} ms (+{regression['change']:.0%})")
+
+    output_path = os.path.join(args.output_dir, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=2)
+    print(f"Results written to {output_path}")
+
+if __name__ == "__main__":
+    main()
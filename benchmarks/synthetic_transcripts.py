@@ -0,0 +1,123 @@
+import random
+from string import ascii_uppercase
+
+# Filler vocabulary for the generated speech, roughly the mix of words you'd hear in a meeting
+VOCABULARY = (
+    "the a to and of we i you it that is for on this so just think need about with have be can "
+    "project team week plan budget deadline customer release update meeting review design issue "
+    "sprint roadmap feature data report quarter numbers timeline launch feedback priority risk "
+    "yeah okay right actually really maybe next last good great sure probably already still"
+).split()
+
+# Single-word entity names, so that they show up in extract_keywords' word level counts
+ENTITY_POOL = {
+    "person_name": ["Alice", "Bob", "Priya", "Carlos", "Mei", "Jonas", "Fatima", "Liam"],
+    "organization": ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Vandelay"],
+    "location": ["Berlin", "Toronto", "Singapore", "Austin", "Lisbon"],
+    "product": ["Kubernetes", "Salesforce", "Jira", "Figma", "Snowflake"],
+    "date": ["Monday", "Friday", "January", "March", "Q3"]
+}
+
+IAB_LABELS = [
+    "Business>BusinessIT", "Technology&Computing>Software", "BusinessAndFinance>Economy",
+    "Careers>RemoteWorking", "PersonalFinance>PersonalInvestment", "Technology&Computing>ArtificialIntelligence",
+    "BusinessAndFinance>Business>MarketingAndAdvertising", "Education>CollegeEducation"
+]
+
+SAFETY_LABELS = ["profanity", "hate_speech", "insult", "threat", "self_harm", "sexual", "violence"]
+
+SENTIMENTS = ["POSITIVE", "NEUTRAL", "NEGATIVE"]
+
+def generate_transcript_data(hours=1.0, speakers=4, utterances_per_hour=600, entity_rate=0.01,
+                             iab_segments_per_hour=12, words_per_minute=150, include_words=True, seed=0):
+    """
+    Generates a realistic transcript_data payload in the shape poll_transcription_status returns,
+    without calling AssemblyAI. Sizes scale with `hours`, so the same settings can produce a 10 minute
+    stand-up or an 8 hour workshop. entity_rate is the share of words replaced by an entity name.
+    """
+    rng = random.Random(seed)
+    total_ms = int(hours * 3600 * 1000)
+    speaker_labels = [ascii_uppercase[i % 26] * (i // 26 + 1) for i in range(speakers)]
+    # Some people talk a lot more than others
+    speaker_weights = [rng.uniform(0.3, 1.0) for _ in speaker_labels]
+    slot_ms = 3600 * 1000 / utterances_per_hour
+    ms_per_word = 60000 / words_per_minute
+
+    utterances, all_words, entities, sentiments = [], [], [], []
+    current = 0
+    previous_speaker = None
+    while current < total_ms:
+        speaker = rng.choices(speaker_labels, weights=speaker_weights)[0]
+        if speaker == previous_speaker and speakers > 1:
+            continue
+        previous_speaker = speaker
+
+        word_count = max(1, int(rng.uniform(0.4, 1.6) * slot_ms / ms_per_word))
+        words = []
+        word_start = current
+        for _ in range(word_count):
+            if rng.random() < entity_rate:
+                entity_type = rng.choice(list(ENTITY_POOL))
+                text = rng.choice(ENTITY_POOL[entity_type])
+                entities.append({"entity_type": entity_type, "text": text,
+                                 "start": int(word_start), "end": int(word_start + ms_per_word)})
+            else:
+                text = rng.choice(VOCABULARY)
+            words.append({"text": text, "start": int(word_start), "end": int(word_start + ms_per_word * 0.9),
+                          "confidence": round(rng.uniform(0.7, 1.0), 3), "speaker": speaker})
+            word_start += ms_per_word
+
+        # Sentiment analysis works per sentence, roughly every 15 words
+        for i in range(0, len(words), 15):
+            sentence = words[i:i + 15]
+            sentiments.append({
+                "text": " ".join(word["text"] for word in sentence),
+                "start": sentence[0]["start"],
+                "end": sentence[-1]["end"],
+                "sentiment": rng.choices(SENTIMENTS, weights=[3, 6, 1])[0],
+                "confidence": round(rng.uniform(0.5, 1.0), 3),
+                "speaker": speaker
+            })
+
+        utterances.append({
+            "speaker": speaker,
+            "text": " ".join(word["text"] for word in words),
+            "start": words[0]["start"],
+            "end": words[-1]["end"],
+            "confidence": round(sum(word["confidence"] for word in words) / len(words), 3),
+            "words": words if include_words else []
+        })
+        if include_words:
+            all_words.extend(words)
+        # Short pause between turns, occasionally people talk over each other
+        current = word_start + rng.uniform(-800, 1500)
+
+    # IAB topic segments split the recording into equal chunks
+    topic_results = []
+    segment_ms = 3600 * 1000 / iab_segments_per_hour
+    for i in range(max(1, int(total_ms / segment_ms))):
+        labels = rng.sample(IAB_LABELS, 3)
+        topic_results.append({
+            "text": "",
+            "labels": [{"relevance": round(rng.uniform(0.1, 1.0), 3), "label": label} for label in labels],
+            "timestamp": {"start": int(i * segment_ms), "end": int((i + 1) * segment_ms)}
+        })
+    topic_summary = {label: round(rng.uniform(0.0, 1.0), 3) for label in IAB_LABELS}
+
+    return {
+        "id": f"synthetic-{seed}",
+        "status": "completed",
+        "audio_duration": total_ms // 1000,
+        "text": " ".join(utterance["text"] for utterance in utterances),
+        "words": all_words,
+        "utterances": utterances,
+        "summary": "\n".join(f"- {rng.choice(VOCABULARY)} {rng.choice(VOCABULARY)} discussion" for _ in range(5)),
+        "entities": entities,
+        "sentiment_analysis_results": sentiments,
+        "iab_categories_result": {"status": "success", "results": topic_results, "summary": topic_summary},
+        "content_safety_labels": {
+            "status": "success",
+            "results": [],
+            "summary": {label: round(rng.uniform(0.0, 0.6), 3) for label in SAFETY_LABELS}
+        }
+    }
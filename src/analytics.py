@@ -0,0 +1,213 @@
+import os
+import json
+import argparse
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from src.assemblyai_processing import process_transcription_data
+from src.transcript_store import ARCHIVE_EXTENSION, load_transcript
+from src.conversation_dynamics import WINDOW_MS, conversation_dynamics, dynamics_report
+
+# Confidence threshold for topic relevance and content safety flagging, this can be changed as per requirements
+CONFIDENCE_THRESHOLD = 0.5
+
+# Readable labels for the content safety categories returned by AssemblyAI
+SAFETY_CATEGORIES = {
+    "hate_speech": "Hate Speech",
+    "insult": "Insults",
+    "profanity": "Profanity",
+    "threat": "Threats",
+    "self_harm": "Self-Harm References",
+    "sexual": "Sexual Content",
+    "violence": "Violence"
+}
+
+def extract_keywords(text, entities):
+    """
+    Analyzes text to count occurrences of detected entities.
+    Returns frequency count of entities found in the text.
+    """
+    # Create a dictionary of all entities and their variations
+    entity_dict = {}
+    for entity in entities:
+        # Use the entity text as key and store its type
+        entity_dict[entity["text"].lower()] = entity["entity_type"]
+
+    # Count occurrences of entities in text
+    words = text.lower().split()
+    entity_counts = Counter()
+
+    # Look for entities in the text
+    for word in words:
+        if word in entity_dict:
+            entity_counts[word] += 1
+
+    return entity_counts
+
+def speaking_time_distribution(speakers):
+    """
+    Returns the share of the total speaking time (in percent) for every speaker.
+    """
+    total_duration = sum(data["duration"] for data in speakers.values())
+    if not total_duration:
+        return {speaker: 0.0 for speaker in speakers}
+    return {speaker: (data["duration"] / total_duration) * 100
+            for speaker, data in speakers.items()}
+
+def entity_counts(speakers, entities):
+    """
+    Counts entity mentions across the whole conversation and for every speaker individually.
+    Returns a tuple of (overall counts, {speaker: counts}).
+    """
+    all_text = " ".join(data["text"] for data in speakers.values())
+    overall = extract_keywords(all_text, entities)
+    per_speaker = {speaker: extract_keywords(data["text"], entities)
+                   for speaker, data in speakers.items()}
+    return overall, per_speaker
+
+def group_entities(entities):
+    """
+    Groups the unique entity texts by their entity type.
+    """
+    grouped_entities = defaultdict(dict)
+    for entity in entities:
+        grouped_entities[entity["entity_type"]][entity["text"]] = None  # dict keys keep the first-seen order without duplicates
+    return {category: list(items) for category, items in grouped_entities.items()}
+
+def sentiment_distribution(sentiment_analysis):
+    """
+    Tallies the POSITIVE/NEUTRAL/NEGATIVE results of the sentiment analysis.
+    """
+    sentiments_summary = {}
+    for sentiment in sentiment_analysis:
+        sentiment_type = sentiment["sentiment"]
+        sentiments_summary[sentiment_type] = sentiments_summary.get(sentiment_type, 0) + 1
+    return sentiments_summary
+
+def filter_topics(topics, threshold=CONFIDENCE_THRESHOLD):
+    """
+    Keeps only the topics above the confidence threshold, sorted from most to least relevant.
+    """
+    filtered_topics = {topic: confidence
+                       for topic, confidence in topics.items()
+                       if confidence > threshold}
+    return dict(sorted(filtered_topics.items(), key=lambda x: x[1], reverse=True))
+
+def content_safety_scores(content_safety, threshold=CONFIDENCE_THRESHOLD):
+    """
+    Maps the content safety summary onto readable labels and flags the categories above the threshold.
+    """
+    return {
+        label: {
+            "confidence": content_safety[category],
+            "flagged": content_safety[category] > threshold
+        }
+        for category, label in SAFETY_CATEGORIES.items()
+        if category in content_safety
+    }
+
+def analyze_transcript(transcript_data, threshold=CONFIDENCE_THRESHOLD, top_n=10, speaker_top_n=5, window_ms=WINDOW_MS):
+    """
+    Runs every dashboard computation on a raw transcript and returns a compact, JSON serializable report.
+    The full and speaker-wise transcripts are left out on purpose to keep the report small.
+    """
+    _, speakers, _, entities, sentiment_analysis, topics, content_safety, _ = process_transcription_data(transcript_data)
+    overall_entities, speaker_entities = entity_counts(speakers, entities)
+    speaking_times = speaking_time_distribution(speakers)
+
+    return {
+        "id": transcript_data.get("id"),
+        "audio_duration": transcript_data.get("audio_duration"),
+        "speakers": {
+            speaker: {
+                "duration": data["duration"],
+                "speaking_time_pct": round(speaking_times[speaker], 2),
+                "top_entities": dict(speaker_entities[speaker].most_common(speaker_top_n))
+            }
+            for speaker, data in speakers.items()
+        },
+        "top_entities": dict(overall_entities.most_common(top_n)),
+        "entities_by_type": group_entities(entities),
+        "sentiment": sentiment_distribution(sentiment_analysis),
+        "topics": filter_topics(topics, threshold),
+        "content_safety": content_safety_scores(content_safety, threshold),
+        "dynamics": dynamics_report(conversation_dynamics(
+            transcript_data["utterances"], sentiment_analysis, list(speakers), window_ms))
+    }
+
+def analyze_transcript_file(path, threshold=CONFIDENCE_THRESHOLD, window_ms=WINDOW_MS):
+    """
+    Loads a cached transcript JSON file (or an archived transcript) and analyzes it. Used as the unit of work for the process pool.
+    """
+    if path.endswith(ARCHIVE_EXTENSION):
+        transcript_data = load_transcript(path)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            transcript_data = json.load(f)
+    if not isinstance(transcript_data, dict) or "utterances" not in transcript_data:
+        raise ValueError(f"{path} is not a transcript")
+    report = analyze_transcript(transcript_data, threshold, window_ms=window_ms)
+    report["file"] = os.path.basename(path)
+    return report
+
+def _analyze_directory_file(path, threshold, window_ms):
+    # Other JSON files can live next to the transcripts, e.g. the report of an earlier run
+    try:
+        return analyze_transcript_file(path, threshold, window_ms)
+    except ValueError as e:
+        print(f"Skipping {os.path.basename(path)}: {e}")
+        return None
+
+def analyze_directory(directory, workers=None, threshold=CONFIDENCE_THRESHOLD, window_ms=WINDOW_MS):
+    """
+    Analyzes every transcript JSON file and archived transcript in a directory, spreading the files over a pool of processes.
+    JSON files that aren't transcripts are skipped.
+    """
+    paths = sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.endswith((".json", ARCHIVE_EXTENSION))
+    )
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        reports = executor.map(_analyze_directory_file, paths, [threshold] * len(paths), [window_ms] * len(paths))
+        return [report for report in reports if report is not None]
+
+def write_report(reports, output_path):
+    """
+    Writes the reports as JSON, or as Parquet (one row per meeting) when the output ends with .parquet.
+    """
+    if output_path.endswith(".parquet"):
+        import pandas as pd
+        # Nested fields are stored as JSON strings so that every meeting fits in a single flat row
+        rows = [
+            {key: json.dumps(value) if isinstance(value, (dict, list)) else value
+             for key, value in report.items()}
+            for report in reports
+        ]
+        pd.DataFrame(rows).to_parquet(output_path, index=False)
+    else:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+def main(argv=None):
+    """
+    Command line entry point, e.g. `python -m src.analytics data/transcripts -o report.json --workers 4`
+    """
+    parser = argparse.ArgumentParser(description="Analyze cached SpeakerLens transcripts without the Streamlit UI.")
+    parser.add_argument("path", help="A transcript JSON or archive file, or a directory of them")
+    parser.add_argument("-o", "--output", default="report.json", help="Output file (.json or .parquet)")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (defaults to the CPU count)")
+    parser.add_argument("--threshold", type=float, default=CONFIDENCE_THRESHOLD, help="Confidence threshold for topics and content safety")
+    parser.add_argument("--window", type=float, default=WINDOW_MS / 1000, help="Window length in seconds for the conversation dynamics")
+    args = parser.parse_args(argv)
+
+    window_ms = int(args.window * 1000)
+    if os.path.isdir(args.path):
+        reports = analyze_directory(args.path, args.workers, args.threshold, window_ms)
+    else:
+        reports = [analyze_transcript_file(args.path, args.threshold, window_ms)]
+
+    write_report(reports, args.output)
+    print(f"Analyzed {len(reports)} transcript(s). Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
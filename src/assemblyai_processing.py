@@ -2,13 +2,17 @@ import os
 import requests
 from dotenv import load_dotenv
 import time
+from contextlib import contextmanager
+from src.audio_preprocessing import preprocess_for_upload, report_savings
+from src.tracing import span, traced
 
 # API key loaded from environment variables
 load_dotenv()
 ASSEMBLYAI_API_KEY = os.getenv("ASSEMBLYAI_API_KEY")
 
 # Base URL and headers setup for AssemblyAI API requests
-ASSEMBLYAI_URL = "https://api.assemblyai.com/v2"
+# The URL can be overridden, e.g. to point the app at a local mock server while testing
+ASSEMBLYAI_URL = os.getenv("ASSEMBLYAI_URL", "https://api.assemblyai.com/v2")
 HEADERS = {"authorization": ASSEMBLYAI_API_KEY}
 
 def upload_audio(file_path):
@@ -16,9 +20,10 @@ def upload_audio(file_path):
     Handles the upload of audio filesto AssemblyAI servers and returns a URL for the stored file, including error handling and logging.
     """
     try:
-        with open(file_path, "rb") as f:
-            response = requests.post(f"{ASSEMBLYAI_URL}/upload", headers=HEADERS, files={"file": f})
-        response.raise_for_status()
+        with span("upload", bytes=os.path.getsize(file_path)):
+            with open(file_path, "rb") as f:
+                response = requests.post(f"{ASSEMBLYAI_URL}/upload", headers=HEADERS, files={"file": f})
+            response.raise_for_status()
         audio_url = response.json().get("upload_url")
         print("Audio file uploaded successfully. URL:", audio_url)  # Log the audio file URL for reference and for deebugging
         return audio_url
@@ -38,8 +43,10 @@ def transcribe_basic_audio(audio_url):
     }
     print("Sending basic transcription request with data:", json_data)  # Log the request payload for debugging
     try:
-        response = requests.post(endpoint, headers=HEADERS, json=json_data)
-        response.raise_for_status()
+        with span("job_submission", mode="basic") as submission:
+            response = requests.post(endpoint, headers=HEADERS, json=json_data)
+            response.raise_for_status()
+            submission.set(transcript_id=response.json()["id"])
         return response.json()["id"]  # Return the unique ID for tracking transcription status
     except requests.exceptions.HTTPError as e:
         print(f"Error during transcription request: {e}")
@@ -66,73 +73,169 @@ def transcribe_audio_with_features(audio_url):
     }
     print("Sending transcription request with extended features:", json_data)  # Log the request payload for debugging
     try:
-        response = requests.post(endpoint, headers=HEADERS, json=json_data)
-        response.raise_for_status()
+        with span("job_submission", mode="features") as submission:
+            response = requests.post(endpoint, headers=HEADERS, json=json_data)
+            response.raise_for_status()
+            submission.set(transcript_id=response.json()["id"])
         return response.json()["id"]
     except requests.exceptions.HTTPError as e:
         print(f"HTTP Error during transcription request: {e}")
         print("Server Response:", e.response.json())
         raise
 
-def poll_transcription_status(transcript_id):
+def shift_timestamps(transcript_data, offset_ms):
+    """
+    Moves every timestamp in a transcript offset_ms later, in place. Used when the uploaded audio was
+    trimmed at the start, so the timestamps match the original recording again.
+    """
+    shifted = set()
+    def shift(item):
+        # The utterance words and the top level words can be the same objects, e.g. in merged transcripts
+        if id(item) not in shifted:
+            shifted.add(id(item))
+            item["start"] += offset_ms
+            item["end"] += offset_ms
+
+    for utterance in transcript_data.get("utterances") or []:
+        shift(utterance)
+        for word in utterance.get("words") or []:
+            shift(word)
+    for key in ("words", "sentiment_analysis_results", "entities"):
+        for item in transcript_data.get(key) or []:
+            shift(item)
+    for key in ("iab_categories_result", "content_safety_labels"):
+        for result in (transcript_data.get(key) or {}).get("results") or []:
+            if result.get("timestamp"):
+                shift(result["timestamp"])
+    return transcript_data
+
+def poll_transcription_status(transcript_id, start_offset_ms=0):
     """
     Monitors the transcription progress by checking status every 10 seconds until completion.
+    start_offset_ms is the silence trimmed from the start of the uploaded audio, it's added back to the timestamps.
     """
     endpoint = f"{ASSEMBLYAI_URL}/transcript/{transcript_id}"
+    attempt = 0
     while True:
-        response = requests.get(endpoint, headers=HEADERS)
-        response_data = response.json()
-        status = response_data["status"]
+        attempt += 1
+        with span("poll", transcript_id=transcript_id, attempt=attempt) as poll:
+            response = requests.get(endpoint, headers=HEADERS)
+            # The final response holds the whole transcript, so parsing it gets its own span
+            with span("json_parse", bytes=len(response.content)):
+                response_data = response.json()
+            status = response_data["status"]
+            poll.set(status=status)
         if status == "completed":
             print("Transcription completed successfully.")
+            if start_offset_ms:
+                shift_timestamps(response_data, start_offset_ms)
             return response_data
         elif status == "failed":
             raise RuntimeError("Transcription failed due to an error.")
         print("Transcription in progress... checking again in 10 seconds.") #Logging the status of the transcription.
         time.sleep(10)
 
-def process_transcription_data(transcript_data):
+def aggregate_speakers(utterances, speakers=None):
     """
-    Processes and organizes the transcription results into structured data. Extracts key information
-    including speaker segments, entities,sentiment analysis, and topic categorization.
+    Adds up the speaking time and text of every speaker. Passing in an existing speakers dictionary
+    extends it in place, which lets new batches of utterances be appended without reprocessing older ones.
     """
-    # Get the main transcription text
-    transcription = transcript_data["text"]
-    # Check for available summary or provide a default
-    summary = transcript_data.get("summary", "No summary available.")
-    
-    # Organize speaker specific information
-    speakers = {}
-    for utterance in transcript_data["utterances"]:
+    if speakers is None:
+        speakers = {}
+    # The text pieces are joined once per speaker at the end, adding them to the text one by one copies it every time
+    texts = {}
+    for utterance in utterances:
         speaker = utterance["speaker"]
         duration = utterance["end"] - utterance["start"]
         if speaker not in speakers:
             speakers[speaker] = {"duration": 0, "text": ""}
         speakers[speaker]["duration"] += duration
-        speakers[speaker]["text"] += f" {utterance['text']} "
-    
-    # Gather other analysis data
-    entities = transcript_data.get("entities", [])
-    sentiment_analysis = transcript_data.get("sentiment_analysis_results", [])
-    topics = transcript_data.get("iab_categories_result", {}).get("summary", {})
-    content_safety = transcript_data.get("content_safety_labels", {}).get("summary", {})
+        texts.setdefault(speaker, [speakers[speaker]["text"]]).append(f" {utterance['text']} ")
+    for speaker, parts in texts.items():
+        speakers[speaker]["text"] = "".join(parts)
+    return speakers
+
+def process_transcription_data(transcript_data):
+    """
+    Processes and organizes the transcription results into structured data. Extracts key information
+    including speaker segments, entities,sentiment analysis, and topic categorization.
+    """
+    with span("process_transcription_data", utterances=len(transcript_data["utterances"])):
+        # Get the main transcription text
+        transcription = transcript_data["text"]
+        # Check for available summary or provide a default
+        summary = transcript_data.get("summary", "No summary available.")
+        
+        # Organize speaker specific information
+        speakers = aggregate_speakers(transcript_data["utterances"])
+        
+        # Gather other analysis data
+        entities = transcript_data.get("entities", [])
+        sentiment_analysis = transcript_data.get("sentiment_analysis_results", [])
+        topics = transcript_data.get("iab_categories_result", {}).get("summary", {})
+        content_safety = transcript_data.get("content_safety_labels", {}).get("summary", {})
     
     return transcription, speakers, summary, entities, sentiment_analysis, topics, content_safety, transcript_data
 
-def get_audio_intelligence(file_path, basic=False):
+@contextmanager
+def prepared_upload(file_path, preprocess=False):
     """
-    Main processing function that handles the complete workflow from upload to transcription.
-    Supports both basic and advanced transcription modes based on the requirements.
+    Shrinks the audio locally (mono, 16kHz, low bitrate, silence trimmed) when preprocess=True, unless ffmpeg
+    is missing or fails, or that doesn't make the file smaller. Yields a dictionary with the "path" to upload,
+    the preprocessing "stats" (None for the original file) and the "start_offset_ms" to pass to
+    poll_transcription_status(). The time spent inside the block counts as upload time when the savings
+    are reported, and the processed file is deleted on the way out.
+    """
+    #Optionally shrink the file first, long high-bitrate recordings spend most of their time uploading
+    preprocessing_stats = None
+    if preprocess:
+        with span("preprocess") as preprocessing:
+            preprocessing_stats = preprocess_for_upload(file_path)
+            if preprocessing_stats:
+                preprocessing.set(bytes=preprocessing_stats["original_bytes"],
+                                  bytes_out=preprocessing_stats["processed_bytes"])
+            else:
+                preprocessing.set(skipped=True)
+    if not preprocessing_stats:
+        yield {"path": file_path, "stats": None, "start_offset_ms": 0}
+        return
+
+    upload_start = time.perf_counter()
+    try:
+        yield {
+            "path": preprocessing_stats["path"],
+            "stats": preprocessing_stats,
+            "start_offset_ms": round(preprocessing_stats["start_offset"] * 1000)
+        }
+    finally:
+        os.remove(preprocessing_stats["path"])
+    report_savings(preprocessing_stats, time.perf_counter() - upload_start)
+
+def submit_audio(file_path, basic=False, preprocess=False):
+    """
+    Uploads the audio and starts the transcription job. Returns its transcript ID and the offset in ms
+    to pass to poll_transcription_status(). See prepared_upload() for what preprocess=True does.
     """
-    #For the purpose of this project, we've decided to use the advanced transcription mode as it provides more features and insights.
     #Upload the audio file and retrieve the URL
-    audio_url = upload_audio(file_path)
+    with prepared_upload(file_path, preprocess) as upload:
+        audio_url = upload_audio(upload["path"])
     
     #Choose between basic and full feature transcription
     transcript_id = transcribe_basic_audio(audio_url) if basic else transcribe_audio_with_features(audio_url)
+    return transcript_id, upload["start_offset_ms"]
+
+@traced("audio_intelligence")
+def get_audio_intelligence(file_path, basic=False, preprocess=False):
+    """
+    Main processing function that handles the complete workflow from upload to transcription.
+    Supports both basic and advanced transcription modes based on the requirements.
+    """
+    #For the purpose of this project, we've decided to use the advanced transcription mode as it provides more features and insights.
+    transcript_id, start_offset_ms = submit_audio(file_path, basic, preprocess)
     
     #Poll until the transcription process is complete,then retrieve data
-    transcript_data = poll_transcription_status(transcript_id)
+    with span("transcription_wait", transcript_id=transcript_id):
+        transcript_data = poll_transcription_status(transcript_id, start_offset_ms)
     
     #Process and return transcription data
     return process_transcription_data(transcript_data)
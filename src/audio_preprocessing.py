@@ -0,0 +1,170 @@
+import os
+import re
+import time
+import tempfile
+import subprocess
+
+# ffmpeg does the heavy lifting, it decodes and encodes in small frames so files are never loaded whole
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+
+# Speech recognition doesn't benefit from more than 16kHz mono, and 32kbps MP3 is plenty for speech
+TARGET_SAMPLE_RATE = 16000
+TARGET_BITRATE = "32k"
+
+# Anything quieter than this for at least MIN_SILENCE_SECONDS counts as silence, tweak these as needed
+SILENCE_THRESHOLD_DB = -50
+MIN_SILENCE_SECONDS = 1.0
+# Bit of silence kept around the speech so the first and last words aren't clipped
+SILENCE_PADDING_SECONDS = 0.25
+
+def _run_ffmpeg(args):
+    try:
+        result = subprocess.run([FFMPEG_BINARY, "-hide_banner", "-nostdin", *args],
+                                capture_output=True, text=True)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"ffmpeg not found ({FFMPEG_BINARY}), install it or set FFMPEG_BINARY") from None
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.strip()[-500:]}")
+    return result.stderr  # ffmpeg writes its logs (including silencedetect output) to stderr
+
+def _temp_output_path(file_path):
+    # A unique name per call, so jobs processing the same recording at once don't overwrite each other's output
+    base = os.path.splitext(os.path.basename(file_path))[0]
+    fd, path = tempfile.mkstemp(prefix=f"{base}.", suffix=".preprocessed.mp3")
+    os.close(fd)
+    return path
+
+def detect_silences(file_path, threshold_db=SILENCE_THRESHOLD_DB, min_silence=MIN_SILENCE_SECONDS):
+    """
+    Streams through the audio once with ffmpeg's silencedetect filter.
+    Returns the duration in seconds and a list of (start, end) silent stretches in seconds.
+    """
+    log = _run_ffmpeg([
+        "-i", file_path,
+        "-af", f"silencedetect=noise={threshold_db}dB:d={min_silence}",
+        "-f", "null", "-"
+    ])
+
+    duration = 0.0
+    match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", log)
+    if match:
+        hours, minutes, seconds = match.groups()
+        duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    silences = []
+    silence_start = None
+    for line in log.splitlines():
+        start_match = re.search(r"silence_start: (-?\d+(?:\.\d+)?)", line)
+        end_match = re.search(r"silence_end: (\d+(?:\.\d+)?)", line)
+        if start_match:
+            silence_start = max(0.0, float(start_match.group(1)))
+        elif end_match and silence_start is not None:
+            silences.append((silence_start, float(end_match.group(1))))
+            silence_start = None
+    # A silence that runs until the end of the file never gets a silence_end line
+    if silence_start is not None:
+        silences.append((silence_start, duration))
+
+    return duration, silences
+
+def speech_bounds(duration, silences, padding=SILENCE_PADDING_SECONDS):
+    """
+    Works out where the speech starts and ends, ignoring leading and trailing silence.
+    """
+    start, end = 0.0, duration
+    if silences and silences[0][0] <= 0.05:
+        start = max(0.0, silences[0][1] - padding)
+    if silences and silences[-1][1] >= duration - 0.05:
+        end = min(duration, silences[-1][0] + padding)
+    if end <= start:  # The whole file is silent, keep it as it is
+        return 0.0, duration
+    return start, end
+
+def preprocess_audio(file_path, output_path=None, sample_rate=TARGET_SAMPLE_RATE, bitrate=TARGET_BITRATE, trim_silence=True):
+    """
+    Shrinks an audio file before upload: downmixes to mono, resamples to a speech friendly rate,
+    re-encodes at a low bitrate and trims leading/trailing silence.
+    Returns a dictionary with the output path, byte counts and how long the encoding took.
+    Without an output_path the result is written to a new temporary file, which the caller should delete.
+    Trimming the leading silence shifts the timeline: "start_offset" is how many seconds earlier everything
+    happens in the processed file, and so in its transcript, than in the original recording.
+    """
+    if output_path is None:
+        output_path = _temp_output_path(file_path)
+
+    start_time = time.perf_counter()
+    trimmed_seconds = 0.0
+    speech_start = 0.0
+    if trim_silence:
+        duration, silences = detect_silences(file_path)
+        speech_start, speech_end = speech_bounds(duration, silences)
+        trimmed_seconds = duration - (speech_end - speech_start)
+        # -ss before -i seeks in the input instead of decoding everything up to the start
+        trim_args = ["-ss", f"{speech_start:.3f}", "-i", file_path, "-t", f"{speech_end - speech_start:.3f}"]
+    else:
+        trim_args = ["-i", file_path]
+
+    _run_ffmpeg([
+        "-y", *trim_args,
+        "-vn",                  # Drop any embedded cover art
+        "-ac", "1",             # Downmix to mono
+        "-ar", str(sample_rate),
+        "-codec:a", "libmp3lame",
+        "-b:a", bitrate,
+        output_path
+    ])
+    encode_seconds = time.perf_counter() - start_time
+
+    original_bytes = os.path.getsize(file_path)
+    processed_bytes = os.path.getsize(output_path)
+    return {
+        "path": output_path,
+        "original_bytes": original_bytes,
+        "processed_bytes": processed_bytes,
+        "bytes_saved": original_bytes - processed_bytes,
+        "trimmed_seconds": round(trimmed_seconds, 3),
+        "start_offset": round(speech_start, 3),
+        "encode_seconds": round(encode_seconds, 3)
+    }
+
+def preprocess_for_upload(file_path):
+    """
+    Runs preprocess_audio() when it's worth it. Returns its stats, or None when the original file should be
+    uploaded instead: ffmpeg isn't installed or fails, or the processed file isn't any smaller.
+    The processed file is a temporary file, delete stats["path"] once it has been uploaded.
+    """
+    output_path = _temp_output_path(file_path)
+    try:
+        stats = preprocess_audio(file_path, output_path)
+    except (FileNotFoundError, RuntimeError) as e:
+        print(f"Skipping pre-processing, uploading the original file: {e}")
+        os.remove(output_path)  # ffmpeg may have left a partial file behind
+        return None
+    if stats["bytes_saved"] <= 0:
+        print("Pre-processing didn't make the file smaller, uploading the original file.")
+        os.remove(output_path)
+        return None
+    if stats["start_offset"] > 0:
+        print(f"Trimmed {stats['start_offset']:.2f}s of leading silence, "
+              f"the transcript timestamps are shifted back to match the original recording.")
+    return stats
+
+def report_savings(stats, upload_seconds):
+    """
+    Compares the encoding time against the upload time it saved. The upload throughput measured for the
+    processed file is used to estimate how long the original file would have taken to upload.
+    """
+    throughput = stats["processed_bytes"] / upload_seconds if upload_seconds > 0 else 0
+    upload_seconds_saved = stats["bytes_saved"] / throughput if throughput else 0.0
+    report = dict(stats)
+    report.update({
+        "upload_seconds": round(upload_seconds, 3),
+        "upload_seconds_saved": round(upload_seconds_saved, 3),
+        "net_seconds_saved": round(upload_seconds_saved - stats["encode_seconds"], 3)
+    })
+    print(
+        f"Pre-processing saved {stats['bytes_saved'] / 1e6:.2f} MB "
+        f"({stats['original_bytes'] / 1e6:.2f} MB -> {stats['processed_bytes'] / 1e6:.2f} MB). "
+        f"Encoding took {stats['encode_seconds']:.2f}s and saved an estimated {upload_seconds_saved:.2f}s of upload time."
+    )
+    return report
@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+
+# Length of the time windows the talk ratio, turn-taking counts and sentiment are computed over
+WINDOW_MS = 60 * 1000
+# The sentiment curves are smoothed over this many trailing windows
+ROLLING_WINDOWS = 5
+# Sentiment labels mapped onto a score, a window's sentiment is the confidence weighted mean of its results
+SENTIMENT_SCORES = {"POSITIVE": 1.0, "NEUTRAL": 0.0, "NEGATIVE": -1.0}
+
+def _frame(records, columns):
+    """
+    Accepts either the lists of dicts in transcript_data or DataFrames (e.g. TranscriptArchive.frame()).
+    """
+    if isinstance(records, pd.DataFrame):
+        return records
+    return pd.DataFrame.from_records(list(records or []), columns=columns)
+
+def _cumulative_talk(starts, ends, times):
+    """
+    Total length of the intervals [starts, ends) before each of `times`, without looping over the intervals:
+    an interval contributes max(t - start, 0) - max(t - end, 0), both sums come from sorted prefix sums.
+    """
+    starts = np.sort(starts)
+    ends = np.sort(ends)
+    start_sums = np.concatenate(([0], np.cumsum(starts)))
+    end_sums = np.concatenate(([0], np.cumsum(ends)))
+    started = np.searchsorted(starts, times)
+    ended = np.searchsorted(ends, times)
+    return (started * times - start_sums[started]) - (ended * times - end_sums[ended])
+
+def _rolling_sum(matrix, windows):
+    """
+    Sum over the trailing `windows` columns of every row.
+    """
+    cumulative = np.concatenate((np.zeros((matrix.shape[0], 1)), np.cumsum(matrix, axis=1)), axis=1)
+    upper = np.arange(1, matrix.shape[1] + 1)
+    return cumulative[:, upper] - cumulative[:, np.maximum(upper - windows, 0)]
+
+def conversation_dynamics(utterances, sentiment_analysis=None, speakers=None, window_ms=WINDOW_MS,
+                          rolling_windows=ROLLING_WINDOWS):
+    """
+    Computes how the conversation unfolds over time in a single vectorized pass over the utterance and
+    sentiment arrays: talk time and talk ratio per speaker and window, rolling sentiment per speaker,
+    interruptions, overlaps and turn-taking latency.
+
+    A turn starts whenever someone other than the current floor holder (the speaker whose utterance ends last
+    so far) starts talking. Starting before the floor holder has finished is an overlap, and it's an
+    interruption when the floor holder stops first. The latency of a turn is the silence before it.
+    Returns a dict of pandas objects indexed by the start of every window in minutes.
+    """
+    utterances = _frame(utterances, ["speaker", "start", "end"])
+    sentiment = _frame(sentiment_analysis, ["speaker", "start", "end", "sentiment", "confidence"])
+    if speakers is None:
+        speakers = list(pd.unique(pd.concat([utterances["speaker"], sentiment["speaker"]]).dropna()))
+    speakers = list(speakers)
+    speaker_count = len(speakers)
+
+    # Utterance arrays sorted by start time, speakers as integer codes (-1 for speakers not in the list)
+    order = np.argsort(utterances["start"].to_numpy(np.int64), kind="stable")
+    starts = utterances["start"].to_numpy(np.int64)[order]
+    ends = utterances["end"].to_numpy(np.int64)[order]
+    speaker_index = pd.Index(speakers)
+    codes = speaker_index.get_indexer(utterances["speaker"])[order].astype(np.int64)
+
+    sentiment_ends = sentiment["end"].to_numpy(np.int64)
+    duration_ms = max(ends.max(initial=0), sentiment_ends.max(initial=0))
+    window_count = max(1, -(-duration_ms // window_ms))
+    edges = np.arange(window_count + 1, dtype=np.int64) * window_ms
+    index = pd.Index(edges[:-1] / 60000, name="minute")
+
+    # Talk time per speaker and window, from the cumulative talk time at every window edge
+    talk = np.zeros((speaker_count, window_count))
+    for code in range(speaker_count):
+        mask = codes == code
+        talk[code] = np.diff(_cumulative_talk(starts[mask], ends[mask], edges))
+    window_talk = talk.sum(axis=0)
+    talk_ratio = np.divide(talk, window_talk, out=np.zeros_like(talk), where=window_talk > 0)
+
+    # Turn-taking: compare every utterance with the floor holder before it
+    floor_end = np.maximum.accumulate(ends)
+    positions = np.arange(len(ends))
+    holder = np.maximum.accumulate(np.where(ends >= floor_end, positions, 0)) if len(ends) else positions
+    current = codes[1:]
+    previous = codes[holder[:-1]]
+    previous_end = floor_end[:-1]
+    turn = (current != previous) & (current >= 0) & (previous >= 0)
+    gap = starts[1:] - previous_end
+    overlap = turn & (gap < 0)
+    overlap_ms = np.where(overlap, np.minimum(previous_end, ends[1:]) - starts[1:], 0)
+    interruption = overlap & (ends[1:] > previous_end)
+    responded = turn & (gap >= 0)
+    event_window = np.minimum(starts[1:] // window_ms, window_count - 1)
+
+    turn_codes = np.concatenate((codes[:1], current[turn]))
+    turn_codes = turn_codes[turn_codes >= 0]
+    latencies = pd.Series(gap[responded])
+    speaker_stats = pd.DataFrame({
+        "turns": np.bincount(turn_codes, minlength=speaker_count),
+        "talk_seconds": talk.sum(axis=1) / 1000,
+        "interruptions": np.bincount(current[interruption], minlength=speaker_count),
+        "interrupted": np.bincount(previous[interruption], minlength=speaker_count),
+        "overlaps": np.bincount(current[overlap], minlength=speaker_count),
+        "overlap_seconds": np.bincount(current[overlap], weights=overlap_ms[overlap], minlength=speaker_count) / 1000,
+        "median_latency_ms": latencies.groupby(current[responded]).median().reindex(range(speaker_count)).to_numpy()
+    }, index=pd.Index(speakers, name="speaker"))
+
+    window_stats = pd.DataFrame({
+        "turns": np.bincount(event_window[turn], minlength=window_count),
+        "interruptions": np.bincount(event_window[interruption], minlength=window_count),
+        "overlaps": np.bincount(event_window[overlap], minlength=window_count),
+        "overlap_seconds": np.bincount(event_window[overlap], weights=overlap_ms[overlap], minlength=window_count) / 1000,
+        "median_latency_ms": latencies.groupby(event_window[responded]).median().reindex(range(window_count)).to_numpy()
+    }, index=index)
+
+    pairs = np.bincount(current[interruption] * speaker_count + previous[interruption],
+                        minlength=speaker_count * speaker_count).reshape(speaker_count, speaker_count)
+    interruption_matrix = pd.DataFrame(pairs, index=pd.Index(speakers, name="interrupter"),
+                                       columns=pd.Index(speakers, name="interrupted"))
+
+    # Rolling sentiment, confidence weighted scores summed per speaker and window (by the middle of each result)
+    scores = sentiment["sentiment"].map(SENTIMENT_SCORES).to_numpy(np.float64)
+    weights = sentiment["confidence"].fillna(1.0).to_numpy(np.float64)
+    sentiment_window = np.minimum(
+        (sentiment["start"].to_numpy(np.int64) + sentiment_ends) // 2 // window_ms, window_count - 1)
+    sentiment_codes = speaker_index.get_indexer(sentiment["speaker"]).astype(np.int64)
+    scored = ~np.isnan(scores)
+    by_speaker = scored & (sentiment_codes >= 0)
+    cells = sentiment_codes[by_speaker] * window_count + sentiment_window[by_speaker]
+    score_sums = np.bincount(cells, weights=scores[by_speaker] * weights[by_speaker],
+                             minlength=speaker_count * window_count).reshape(speaker_count, window_count)
+    weight_sums = np.bincount(cells, weights=weights[by_speaker],
+                              minlength=speaker_count * window_count).reshape(speaker_count, window_count)
+    overall_scores = np.bincount(sentiment_window[scored], weights=scores[scored] * weights[scored], minlength=window_count)
+    overall_weights = np.bincount(sentiment_window[scored], weights=weights[scored], minlength=window_count)
+
+    rolling_scores = _rolling_sum(np.vstack((score_sums, overall_scores)), rolling_windows)
+    rolling_weights = _rolling_sum(np.vstack((weight_sums, overall_weights)), rolling_windows)
+    rolling_sentiment = np.divide(rolling_scores, rolling_weights, out=np.full_like(rolling_scores, np.nan),
+                                  where=rolling_weights > 0)
+
+    return {
+        "window_ms": window_ms,
+        "talk_seconds": pd.DataFrame(talk.T / 1000, index=index, columns=speakers),
+        "talk_ratio": pd.DataFrame(talk_ratio.T, index=index, columns=speakers),
+        "sentiment": pd.DataFrame(rolling_sentiment[:-1].T, index=index, columns=speakers),
+        "overall_sentiment": pd.Series(rolling_sentiment[-1], index=index, name="overall"),
+        "windows": window_stats,
+        "speakers": speaker_stats,
+        "interruptions": interruption_matrix
+    }
+
+def _values(values, digits=3):
+    return [None if pd.isna(value) else int(value) if isinstance(value, (int, np.integer)) else round(float(value), digits)
+            for value in values]
+
+def dynamics_report(dynamics):
+    """
+    JSON serializable version of conversation_dynamics() for the headless export.
+    """
+    speaker_stats = {column: _values(values) for column, values in dynamics["speakers"].items()}
+    windows = dynamics["windows"]
+    return {
+        "window_seconds": dynamics["window_ms"] / 1000,
+        "speakers": {
+            str(speaker): {column: values[i] for column, values in speaker_stats.items()}
+            for i, speaker in enumerate(dynamics["speakers"].index)
+        },
+        "interruptions": {
+            str(interrupter): {str(interrupted): int(count) for interrupted, count in row.items() if count}
+            for interrupter, row in dynamics["interruptions"].iterrows()
+        },
+        "windows": {
+            "minute": _values(windows.index),
+            **{column: _values(windows[column]) for column in windows.columns},
+            "talk_ratio": {str(speaker): _values(values) for speaker, values in dynamics["talk_ratio"].items()},
+            "rolling_sentiment": {str(speaker): _values(values) for speaker, values in dynamics["sentiment"].items()},
+            "overall_sentiment": _values(dynamics["overall_sentiment"])
+        }
+    }
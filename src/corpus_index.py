@@ -0,0 +1,289 @@
+import os
+import json
+import argparse
+from datetime import datetime
+from typing import Dict, List, Optional
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import Embeddings
+from src.rag_system import TranscriptRAG
+from src.assemblyai_processing import process_transcription_data
+
+def date_key(date: str) -> int:
+    """
+    Numeric form of a YYYY-MM-DD date (e.g. 20240131) so Chroma can filter on date ranges.
+    """
+    try:
+        return int(datetime.strptime(date, "%Y-%m-%d").strftime("%Y%m%d"))
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid date {date!r}, expected YYYY-MM-DD") from None
+
+class _IndexEmbeddings(Embeddings):
+    """
+    Hands the index's embedding calls to its TranscriptRAG, which is only created on the first call.
+    """
+    def __init__(self, index):
+        self.index = index
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.index.rag.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.index.rag.embeddings.embed_query(text)
+
+class CorpusIndex:
+    """
+    A persistent vector index over many meetings at once, built on the same chunks that
+    TranscriptRAG.prepare_documents produces for a single transcript. Every chunk carries the
+    meeting it came from, so meetings can be added or removed one at a time and retrieval can
+    be narrowed down to a meeting, a speaker or a date range.
+    """
+    def __init__(self, persist_directory="./data/corpus_index", embeddings=None, rag=None):
+        self._rag = rag
+        self._embeddings = embeddings
+        self.persist_directory = persist_directory
+        os.makedirs(persist_directory, exist_ok=True)
+        # Chroma keeps an HNSW graph per collection, so a query only visits a small part of the index.
+        # The corpus_search benchmark measures the query latency on a corpus of realistic size.
+        self.vector_store = Chroma(
+            collection_name="meetings",
+            embedding_function=_IndexEmbeddings(self),
+            persist_directory=persist_directory,
+            collection_metadata={"hnsw:space": "cosine"}
+        )
+        # Per-meeting metadata (date, speakers, duration, number of chunks) lives next to the vector store
+        self.meetings_path = os.path.join(persist_directory, "meetings.json")
+        self.meetings = self._load_meetings()
+
+    @property
+    def rag(self) -> TranscriptRAG:
+        # Reusing TranscriptRAG keeps the chunking identical to the single transcript Q&A. It's only created
+        # (along with the OpenAI clients) when meetings are added or searched, listing and removing work without it.
+        if self._rag is None:
+            self._rag = TranscriptRAG(embeddings=self._embeddings)
+        return self._rag
+
+    def _load_meetings(self) -> Dict:
+        if os.path.exists(self.meetings_path):
+            with open(self.meetings_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def _save_meetings(self):
+        with open(self.meetings_path, "w", encoding="utf-8") as f:
+            json.dump(self.meetings, f, indent=2)
+
+    @staticmethod
+    def _chunk_ids(meeting_id: str, count: int, start: int = 0) -> List[str]:
+        return [f"{meeting_id}:{i}" for i in range(start, count)]
+
+    def add_meeting(self, meeting_id: str, transcription: str, speakers_data: Dict,
+                    date: Optional[str] = None, duration: Optional[float] = None, title: Optional[str] = None) -> int:
+        """
+        Chunks a meeting and adds it to the index. Re-adding an existing meeting replaces it.
+        Dates are expected as YYYY-MM-DD strings and durations in seconds. Returns the number of chunks added.
+        """
+        key = date_key(date) if date else None
+        if meeting_id in self.meetings:
+            self.remove_meeting(meeting_id)
+
+        documents = self.rag.prepare_documents(transcription, speakers_data)
+        meeting_metadata = {
+            "meeting_id": meeting_id,
+            "speakers": ", ".join(speakers_data.keys()),  # Chroma metadata only accepts scalar values
+            "title": title,
+            "date": date,
+            "date_key": key,
+            "duration": duration
+        }
+        for document in documents:
+            document.metadata.update({k: v for k, v in meeting_metadata.items() if v is not None})
+
+        ids = self._chunk_ids(meeting_id, len(documents))
+        if documents:
+            self.vector_store.add_documents(documents, ids=ids)
+
+        self.meetings[meeting_id] = {
+            "title": title,
+            "date": date,
+            "duration": duration,
+            "speakers": list(speakers_data.keys()),
+            "chunks": len(ids)
+        }
+        self._save_meetings()
+        return len(ids)
+
+    def append_to_meeting(self, meeting_id: str, transcription: str, speakers_data: Dict,
+                          duration: Optional[float] = None, date: Optional[str] = None, title: Optional[str] = None) -> int:
+        """
+        Chunks only the new part of a meeting (e.g. the latest segment of a live recording) and adds it
+        to the index next to the chunks that are already there. speakers_data should only hold the new text.
+        The meeting is created if it doesn't exist yet. Returns the number of chunks added.
+        """
+        meeting = self.meetings.get(meeting_id)
+        if meeting is None:
+            if date:
+                date_key(date)  # Rejects a malformed date before the meeting is stored
+            meeting = {"title": title, "date": date, "duration": 0, "speakers": [], "chunks": 0, "segments": 0}
+            self.meetings[meeting_id] = meeting
+
+        documents = self.rag.prepare_documents(transcription, speakers_data)
+        speakers = meeting["speakers"] + [s for s in speakers_data if s not in meeting["speakers"]]
+        chunk_metadata = {
+            "meeting_id": meeting_id,
+            "speakers": ", ".join(speakers),
+            "title": meeting["title"],
+            "date": meeting["date"],
+            "date_key": date_key(meeting["date"]) if meeting["date"] else None,
+            "segment": meeting.get("segments", 0)
+        }
+        for document in documents:
+            document.metadata.update({k: v for k, v in chunk_metadata.items() if v is not None})
+
+        # New chunk ids continue from the existing ones so earlier segments are never re-embedded
+        ids = self._chunk_ids(meeting_id, meeting["chunks"] + len(documents), start=meeting["chunks"])
+        if documents:
+            self.vector_store.add_documents(documents, ids=ids)
+
+        meeting["speakers"] = speakers
+        meeting["chunks"] += len(ids)
+        meeting["segments"] = meeting.get("segments", 0) + 1
+        if duration is not None:
+            meeting["duration"] = (meeting["duration"] or 0) + duration
+        self._save_meetings()
+        return len(ids)
+
+    def add_transcript(self, meeting_id: str, transcript_data: Dict, date: Optional[str] = None, title: Optional[str] = None) -> int:
+        """
+        Adds a raw transcript as returned by AssemblyAI to the index.
+        """
+        transcription, speakers, *_ = process_transcription_data(transcript_data)
+        return self.add_meeting(
+            meeting_id, transcription, speakers,
+            date=date, duration=transcript_data.get("audio_duration"), title=title
+        )
+
+    def remove_meeting(self, meeting_id: str):
+        """
+        Removes every chunk of a meeting from the index without touching the other meetings.
+        """
+        meeting = self.meetings.pop(meeting_id, None)
+        if meeting is None:
+            return
+        if meeting["chunks"]:
+            self.vector_store.delete(ids=self._chunk_ids(meeting_id, meeting["chunks"]))
+        self._save_meetings()
+
+    def list_meetings(self) -> Dict:
+        return dict(self.meetings)
+
+    @staticmethod
+    def build_filter(meeting_id=None, speaker=None, date_from=None, date_to=None) -> Optional[Dict]:
+        """
+        Builds a Chroma metadata filter. meeting_id may be a single id or a list of ids.
+        Raises ValueError for dates that aren't YYYY-MM-DD.
+        """
+        conditions = []
+        if meeting_id is not None:
+            if isinstance(meeting_id, (list, tuple, set)):
+                conditions.append({"meeting_id": {"$in": list(meeting_id)}})
+            else:
+                conditions.append({"meeting_id": meeting_id})
+        if speaker is not None:
+            conditions.append({"speaker": speaker})
+        if date_from is not None:
+            conditions.append({"date_key": {"$gte": date_key(date_from)}})
+        if date_to is not None:
+            conditions.append({"date_key": {"$lte": date_key(date_to)}})
+
+        if not conditions:
+            return None
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"$and": conditions}
+
+    def search(self, query: str, k: int = 4, **filters) -> List[Dict]:
+        """
+        Finds the k most similar chunks across the corpus, optionally filtered by
+        meeting_id, speaker, date_from and date_to.
+        """
+        results = self.vector_store.similarity_search_with_relevance_scores(
+            query, k=k, filter=self.build_filter(**filters)
+        )
+        return [
+            {"text": doc.page_content, "metadata": doc.metadata, "score": score}
+            for doc, score in results
+        ]
+
+    def as_retriever(self, k: int = 4, **filters):
+        """
+        Returns a retriever that can be passed to TranscriptRAG.setup_qa_chain to ask questions across meetings.
+        """
+        search_kwargs = {"k": k}
+        where = self.build_filter(**filters)
+        if where:
+            search_kwargs["filter"] = where
+        return self.vector_store.as_retriever(search_kwargs=search_kwargs)
+
+def main(argv=None):
+    """
+    Command line entry point for managing the corpus index, e.g.
+    `python -m src.corpus_index add meeting.json --date 2024-01-31` or `python -m src.corpus_index query "vendor X"`
+    """
+    def date_argument(value):
+        try:
+            date_key(value)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+        return value
+
+    parser = argparse.ArgumentParser(description="Manage the SpeakerLens cross-meeting corpus index.")
+    parser.add_argument("--index", default="./data/corpus_index", help="Directory of the persistent index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = subparsers.add_parser("add", help="Add (or replace) a meeting from a transcript JSON file")
+    add_parser.add_argument("path")
+    add_parser.add_argument("--meeting-id", help="Defaults to the file name without extension")
+    add_parser.add_argument("--date", type=date_argument, help="Meeting date as YYYY-MM-DD")
+    add_parser.add_argument("--title")
+
+    remove_parser = subparsers.add_parser("remove", help="Remove a meeting from the index")
+    remove_parser.add_argument("meeting_id")
+
+    subparsers.add_parser("list", help="List the indexed meetings")
+
+    query_parser = subparsers.add_parser("query", help="Search across the indexed meetings")
+    query_parser.add_argument("question")
+    query_parser.add_argument("-k", type=int, default=4)
+    query_parser.add_argument("--meeting-id", action="append", help="Restrict to a meeting, can be repeated")
+    query_parser.add_argument("--speaker")
+    query_parser.add_argument("--date-from", type=date_argument)
+    query_parser.add_argument("--date-to", type=date_argument)
+
+    args = parser.parse_args(argv)
+    index = CorpusIndex(args.index)
+
+    if args.command == "add":
+        meeting_id = args.meeting_id or os.path.splitext(os.path.basename(args.path))[0]
+        with open(args.path, "r", encoding="utf-8") as f:
+            transcript_data = json.load(f)
+        chunks = index.add_transcript(meeting_id, transcript_data, date=args.date, title=args.title)
+        print(f"Indexed meeting '{meeting_id}' ({chunks} chunks)")
+    elif args.command == "remove":
+        index.remove_meeting(args.meeting_id)
+        print(f"Removed meeting '{args.meeting_id}'")
+    elif args.command == "list":
+        print(json.dumps(index.list_meetings(), indent=2))
+    elif args.command == "query":
+        results = index.search(
+            args.question, k=args.k, meeting_id=args.meeting_id, speaker=args.speaker,
+            date_from=args.date_from, date_to=args.date_to
+        )
+        for result in results:
+            metadata = result["metadata"]
+            print(f"[{metadata.get('meeting_id')} {metadata.get('date', '')} {metadata.get('speaker', '')}] "
+                  f"score={result['score']:.3f}")
+            print(result["text"][:300])
+            print("---")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import matplotlib.pyplot as plt
+from wordcloud import WordCloud
+
+# Colors used for the sentiment pie chart
+SENTIMENT_COLORS = {
+    'POSITIVE': '#90EE90',
+    'NEUTRAL': '#F0E68C',
+    'NEGATIVE': '#FFB6C1'
+}
+
+def speaking_time_figure(speaking_times, speaker_colors):
+    """
+    Pie chart of the share of speaking time per speaker.
+    """
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.pie(speaking_times.values(),
+           labels=[f"{speaker}\n({percentage:.1f}%)"
+                   for speaker, percentage in speaking_times.items()],
+           colors=[speaker_colors[speaker] for speaker in speaking_times.keys()],
+           autopct='%1.1f%%')
+    ax.set_title("Speaking Time Distribution")
+    return fig
+
+def entity_frequency_figure(most_common_entities, color="#88B04B"):
+    """
+    Horizontal bar chart of the most mentioned entities, given as a list of (entity, count) pairs.
+    """
+    entities_words, counts = zip(*most_common_entities)
+    fig, ax = plt.subplots()
+    ax.barh(entities_words, counts, color=color)
+    ax.set_xlabel("Frequency")
+    return fig
+
+def entity_wordcloud_figure(frequencies):
+    """
+    Word cloud of the entities, sized by how often they were mentioned.
+    """
+    wordcloud = WordCloud(width=400, height=200,
+                          background_color="black",
+                          colormap="Pastel1").generate_from_frequencies(frequencies)
+    fig, ax = plt.subplots(figsize=(10, 5))
+    ax.imshow(wordcloud, interpolation="bilinear")
+    ax.axis("off")
+    return fig
+
+def conversation_flow_figure(utterances, speakers_list, speaker_colors):
+    """
+    Timeline of who spoke when, one row per speaker.
+    """
+    fig, ax = plt.subplots(figsize=(12, 6))
+    for utterance in utterances:
+        speaker_idx = speakers_list.index(utterance["speaker"])
+        start_time = utterance["start"] / 1000
+        duration = (utterance["end"] - utterance["start"]) / 1000
+        ax.barh(y=speaker_idx,
+                width=duration,
+                left=start_time,
+                color=speaker_colors[utterance["speaker"]],
+                alpha=0.7)
+    ax.set_yticks(range(len(speakers_list)))
+    ax.set_yticklabels(speakers_list)
+    ax.set_xlabel("Time (seconds)")
+    ax.set_title("Conversation Flow Timeline")
+    return fig
+
+def topic_figure(topics, title='Topic Distribution'):
+    """
+    Horizontal bar chart of topic confidence scores.
+    """
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.barh(list(topics.keys()),
+            list(topics.values()))
+    ax.set_xlabel('Confidence Score')
+    ax.set_title(title)
+    return fig
+
+def sentiment_figure(sentiments_summary):
+    """
+    Pie chart of the POSITIVE/NEUTRAL/NEGATIVE tallies.
+    """
+    fig, ax = plt.subplots(figsize=(8, 6))
+    ax.pie(sentiments_summary.values(),
+           labels=[f"{k}\n({v} occurrences)" for k, v in sentiments_summary.items()],
+           colors=[SENTIMENT_COLORS.get(k, '#808080') for k in sentiments_summary.keys()],
+           autopct='%1.1f%%')
+    ax.set_title("Sentiment Distribution")
+    return fig
+
+def content_safety_figure(safety_data):
+    """
+    Horizontal bar chart of the content safety scores returned by analytics.content_safety_scores.
+    """
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.barh(list(safety_data.keys()),
+            [score["confidence"] for score in safety_data.values()])
+    ax.set_xlabel('Confidence Score')
+    ax.set_title('Content Safety Analysis')
+    return fig
+
+def talk_ratio_figure(talk_ratio, speaker_colors):
+    """
+    Stacked area chart of every speaker's share of the talk time per window, from conversation_dynamics.
+    """
+    fig, ax = plt.subplots(figsize=(12, 5))
+    ax.stackplot(talk_ratio.index,
+                 (talk_ratio * 100).T.to_numpy(),
+                 labels=list(talk_ratio.columns),
+                 colors=[speaker_colors[speaker] for speaker in talk_ratio.columns],
+                 alpha=0.8)
+    ax.set_ylim(0, 100)
+    ax.set_xlabel("Time (minutes)")
+    ax.set_ylabel("Share of talk time (%)")
+    ax.set_title("Talk Ratio Over Time")
+    ax.legend(loc="upper right")
+    return fig
+
+def rolling_sentiment_figure(sentiment, speaker_colors, overall=None):
+    """
+    Line chart of the rolling sentiment of every speaker (and optionally the whole conversation),
+    from -1 (negative) to 1 (positive).
+    """
+    fig, ax = plt.subplots(figsize=(12, 5))
+    for speaker in sentiment.columns:
+        ax.plot(sentiment.index, sentiment[speaker], color=speaker_colors[speaker], label=speaker)
+    if overall is not None:
+        ax.plot(overall.index, overall, color="#808080", linestyle="--", label="Overall")
+    ax.axhline(0, color="#808080", linewidth=0.8)
+    ax.set_ylim(-1.05, 1.05)
+    ax.set_xlabel("Time (minutes)")
+    ax.set_ylabel("Sentiment")
+    ax.set_title("Rolling Sentiment by Speaker")
+    ax.legend(loc="upper right")
+    return fig
+
+def turn_taking_figure(speaker_stats, speaker_colors):
+    """
+    Interruptions made and received, and the median response latency, per speaker.
+    """
+    fig, (counts_ax, latency_ax) = plt.subplots(1, 2, figsize=(12, 5))
+    positions = range(len(speaker_stats))
+    colors = [speaker_colors[speaker] for speaker in speaker_stats.index]
+    counts_ax.bar([p - 0.2 for p in positions], speaker_stats["interruptions"], width=0.4,
+                  color=colors, label="Interrupting")
+    counts_ax.bar([p + 0.2 for p in positions], speaker_stats["interrupted"], width=0.4,
+                  color=colors, alpha=0.4, label="Interrupted")
+    counts_ax.set_xticks(list(positions))
+    counts_ax.set_xticklabels(speaker_stats.index)
+    counts_ax.set_title("Interruptions")
+    counts_ax.legend()
+    latency_ax.bar(list(positions), speaker_stats["median_latency_ms"].fillna(0) / 1000, color=colors)
+    latency_ax.set_xticks(list(positions))
+    latency_ax.set_xticklabels(speaker_stats.index)
+    latency_ax.set_ylabel("Seconds")
+    latency_ax.set_title("Median Response Latency")
+    return fig
@@ -0,0 +1,160 @@
+import json
+from collections import Counter, defaultdict
+from src.assemblyai_processing import aggregate_speakers
+
+class LocalSegmentSource:
+    """
+    Replays a finished transcript as a sequence of segments, standing in for a live recording.
+    Every segment is a batch in the same shape as a partial AssemblyAI transcript:
+    {"utterances": [...], "entities": [...], "sentiment_analysis_results": [...]}.
+    Any other iterable producing batches like these can be fed to IncrementalTranscript.
+    """
+    def __init__(self, transcript_data, segment_ms=5 * 60 * 1000):
+        self.transcript_data = transcript_data
+        self.segment_ms = segment_ms  # Length of every segment, 5 minutes by default
+
+    @classmethod
+    def from_file(cls, path, segment_ms=5 * 60 * 1000):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f), segment_ms)
+
+    def __iter__(self):
+        batches = defaultdict(lambda: {"utterances": [], "entities": [], "sentiment_analysis_results": []})
+        # Everything is assigned to the segment in which it starts
+        for key in ("utterances", "entities", "sentiment_analysis_results"):
+            for item in self.transcript_data.get(key) or []:
+                batches[item["start"] // self.segment_ms][key].append(item)
+        for segment in sorted(batches):
+            yield batches[segment]
+
+class IncrementalTranscript:
+    """
+    Builds up the speaker aggregates, entity/sentiment counters and (optionally) the vector index
+    one batch of utterances at a time. Appending a batch only touches the new utterances, so the
+    cost of a segment doesn't grow with the length of the recording so far. The full transcript and
+    speaker texts are only joined when they're read.
+    """
+    def __init__(self, index=None, meeting_id="live", date=None, title=None):
+        self.index = index  # Optional CorpusIndex that new segments get appended to
+        self.meeting_id = meeting_id
+        self.date = date
+        self.title = title
+
+        self.utterances = []
+        # Speaking time and text pieces per speaker, the texts are only joined when they're read
+        self.speaker_durations = {}
+        self._speaker_texts = defaultdict(list)
+        self._joined_texts = {}
+        self.entities = []
+        self.entity_types = {}
+        self.sentiment_analysis = []
+        self.sentiment_counts = Counter()
+        # Word counts are kept instead of the text so that entities detected in a later segment
+        # are still counted in the earlier ones, exactly like extract_keywords on the full text
+        self.word_counts = Counter()
+        self.speaker_word_counts = defaultdict(Counter)
+        self.segments = 0
+        self._transcription = None
+
+    def append(self, batch):
+        """
+        Adds a batch of utterances (with its entities and sentiment results) to the running totals.
+        """
+        utterances = batch.get("utterances", [])
+        self.utterances.extend(utterances)
+        if utterances:
+            self._transcription = None
+        for utterance in utterances:
+            speaker = utterance["speaker"]
+            self.speaker_durations[speaker] = self.speaker_durations.get(speaker, 0) + utterance["end"] - utterance["start"]
+            self._speaker_texts[speaker].append(f" {utterance['text']} ")
+            self._joined_texts.pop(speaker, None)
+            words = utterance["text"].lower().split()
+            self.word_counts.update(words)
+            self.speaker_word_counts[speaker].update(words)
+
+        entities = batch.get("entities", [])
+        self.entities.extend(entities)
+        for entity in entities:
+            self.entity_types[entity["text"].lower()] = entity["entity_type"]
+
+        sentiments = batch.get("sentiment_analysis_results", [])
+        self.sentiment_analysis.extend(sentiments)
+        self.sentiment_counts.update(sentiment["sentiment"] for sentiment in sentiments)
+
+        # Only the text of this batch gets chunked and embedded
+        if self.index is not None and utterances:
+            self.index.append_to_meeting(
+                self.meeting_id,
+                " ".join(utterance["text"] for utterance in utterances),
+                aggregate_speakers(utterances),
+                duration=(utterances[-1]["end"] - utterances[0]["start"]) / 1000,
+                date=self.date,
+                title=self.title
+            )
+
+        self.segments += 1
+        return self
+
+    def ingest(self, source):
+        """
+        Appends every batch produced by a source (e.g. a LocalSegmentSource).
+        """
+        for batch in source:
+            self.append(batch)
+        return self
+
+    @property
+    def speakers(self):
+        """
+        Same as aggregate_speakers() on all the utterances so far. A speaker's text is joined again
+        only after a batch added to it.
+        """
+        speakers = {}
+        for speaker, duration in self.speaker_durations.items():
+            if speaker not in self._joined_texts:
+                self._joined_texts[speaker] = "".join(self._speaker_texts[speaker])
+            speakers[speaker] = {"duration": duration, "text": self._joined_texts[speaker]}
+        return speakers
+
+    @property
+    def transcription(self):
+        # Joined once per batch at most, not on every access
+        if self._transcription is None:
+            self._transcription = " ".join(utterance["text"] for utterance in self.utterances)
+        return self._transcription
+
+    def entity_counts(self):
+        """
+        Returns the same (overall counts, {speaker: counts}) as analytics.entity_counts on the full transcript,
+        in the same order, so most_common() breaks ties the same way. Both list the entities in the order they
+        are first mentioned, per speaker and across the speaker texts joined in speaker order.
+        """
+        per_speaker = {
+            speaker: Counter({word: count for word, count in self.speaker_word_counts[speaker].items()
+                              if word in self.entity_types})
+            for speaker in self.speaker_durations
+        }
+        overall = Counter()
+        for counts in per_speaker.values():
+            for word in counts:
+                overall[word] = self.word_counts[word]
+        return overall, per_speaker
+
+    def sentiment_distribution(self):
+        return dict(self.sentiment_counts)
+
+    def result(self):
+        """
+        Returns the transcript so far in the same shape as process_transcription_data, so the dashboard
+        can render a recording that is still in progress. Summary, topics and content safety are only
+        available once the full recording has been processed.
+        """
+        transcript_data = {
+            "text": self.transcription,
+            "utterances": self.utterances,
+            "entities": self.entities,
+            "sentiment_analysis_results": self.sentiment_analysis
+        }
+        return (self.transcription, self.speakers, "No summary available.", self.entities,
+                self.sentiment_analysis, {}, {}, transcript_data)
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import hashlib
+import threading
+from src.assemblyai_processing import submit_audio, poll_transcription_status, process_transcription_data
+from src.parallel_transcription import transcribe_parallel
+from src.tracing import span
+
+# Job table shared by every Streamlit session (and process) on this machine
+DB_PATH = os.getenv("SPEAKERLENS_JOBS_DB", os.path.join("data", "jobs.db"))
+# Finished transcripts are stored here, named after the hash of the audio
+RESULTS_DIR = os.path.join("data", "transcripts")
+# The session running a job refreshes its heartbeat this often. A job whose heartbeat is older than
+# STALE_AFTER_SECONDS is assumed to be abandoned (e.g. the app was restarted) and gets taken over.
+HEARTBEAT_SECONDS = 10
+STALE_AFTER_SECONDS = 60
+# How often sessions waiting on someone else's job check whether it has finished
+WAIT_SECONDS = 2
+
+def hash_audio(file_path, block_size=1024 * 1024):
+    """
+    SHA-256 of the file contents, read in blocks so large recordings aren't loaded whole.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class Heartbeat:
+    """
+    Calls `beat` every `interval` seconds from a background thread while a long running job is in progress,
+    so other processes can tell a job that is still being worked on from an abandoned one.
+    """
+    def __init__(self, beat, interval):
+        self.beat = beat
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.beat()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+class TranscriptionCoordinator:
+    """
+    Makes sure identical recordings are only transcribed once, even when several sessions upload
+    the same file at about the same time. Jobs are keyed by the hash of the audio in a local SQLite table:
+    the first caller submits and polls, everyone else waits for its result. If the app is restarted
+    mid-job, the next caller resumes polling the existing transcript ID instead of resubmitting.
+    """
+    def __init__(self, db_path=DB_PATH, results_dir=RESULTS_DIR, heartbeat_seconds=HEARTBEAT_SECONDS,
+                 stale_after=STALE_AFTER_SECONDS, wait_seconds=WAIT_SECONDS):
+        self.db_path = db_path
+        self.results_dir = results_dir
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_after = stale_after
+        self.wait_seconds = wait_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        os.makedirs(results_dir, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS transcription_jobs (
+                    audio_hash TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    transcript_id TEXT,
+                    owner TEXT,
+                    heartbeat REAL,
+                    result_path TEXT,
+                    error TEXT,
+                    created_at REAL,
+                    start_offset_ms INTEGER,
+                    PRIMARY KEY (audio_hash, mode)
+                )
+            """)
+            # Tables created before start_offset_ms was added get the column here
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(transcription_jobs)")}
+            if "start_offset_ms" not in columns:
+                try:
+                    connection.execute("ALTER TABLE transcription_jobs ADD COLUMN start_offset_ms INTEGER")
+                except sqlite3.OperationalError:
+                    pass  # Another session added it in the meantime
+
+    def _connect(self):
+        # Autocommit mode, transactions are started explicitly where they're needed
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _update(self, audio_hash, mode, **fields):
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        with self._connect() as connection:
+            connection.execute(
+                f"UPDATE transcription_jobs SET {assignments} WHERE audio_hash = ? AND mode = ? AND owner = ?",
+                [*fields.values(), audio_hash, mode, self.owner]
+            )
+
+    def _claim(self, audio_hash, mode, requested_at):
+        """
+        Decides atomically what the caller should do: "done" (the result is stored), "own" (run or resume
+        the job), "wait" (someone else is running it) or "failed" (the job this caller was waiting on failed).
+        Returns the action and the job row.
+        """
+        connection = self._connect()
+        connection.row_factory = sqlite3.Row
+        try:
+            # BEGIN IMMEDIATE takes the write lock, so two sessions can never claim the same job
+            connection.execute("BEGIN IMMEDIATE")
+            job = connection.execute(
+                "SELECT * FROM transcription_jobs WHERE audio_hash = ? AND mode = ?", (audio_hash, mode)
+            ).fetchone()
+            now = time.time()
+
+            if job is None:
+                connection.execute(
+                    "INSERT INTO transcription_jobs (audio_hash, mode, status, owner, heartbeat, created_at) "
+                    "VALUES (?, ?, 'submitting', ?, ?, ?)",
+                    (audio_hash, mode, self.owner, now, now)
+                )
+                action = "own"
+            elif job["status"] == "completed" and job["result_path"] and os.path.exists(job["result_path"]):
+                action = "done"
+            elif job["status"] in ("submitting", "polling") and now - (job["heartbeat"] or 0) < self.stale_after:
+                action = "wait"
+            elif job["status"] == "failed" and (job["heartbeat"] or 0) >= requested_at:
+                # The job failed while this caller was waiting on it, only requests made after the failure retry it
+                action = "failed"
+            else:
+                # Failed before this request, abandoned or with a missing result: take it over and keep any transcript ID it had
+                connection.execute(
+                    "UPDATE transcription_jobs SET owner = ?, heartbeat = ?, error = NULL, "
+                    "status = CASE WHEN transcript_id IS NULL OR status = 'failed' THEN 'submitting' ELSE 'polling' END, "
+                    "transcript_id = CASE WHEN status = 'failed' THEN NULL ELSE transcript_id END "
+                    "WHERE audio_hash = ? AND mode = ?",
+                    (self.owner, now, audio_hash, mode)
+                )
+                job = connection.execute(
+                    "SELECT * FROM transcription_jobs WHERE audio_hash = ? AND mode = ?", (audio_hash, mode)
+                ).fetchone()
+                action = "own"
+            connection.execute("COMMIT")
+            return action, dict(job) if job else None
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def _run(self, job, audio_hash, mode, file_path, basic, preprocess, split):
+        """
+        Runs (or resumes) the job as its owner and stores the result for everyone waiting on it.
+        """
+        with Heartbeat(lambda: self._update(audio_hash, mode, heartbeat=time.time()), self.heartbeat_seconds):
+            try:
+                if split:
+                    # Segment jobs can't be resumed one by one, an abandoned split job starts over
+                    transcript_data = transcribe_parallel(file_path, basic, preprocess)
+                else:
+                    transcript_id = job and job.get("transcript_id")
+                    if transcript_id:
+                        print(f"Resuming transcription job {transcript_id} instead of resubmitting.")
+                        start_offset_ms = job.get("start_offset_ms") or 0
+                    else:
+                        transcript_id, start_offset_ms = submit_audio(file_path, basic, preprocess)
+                        # The offset is stored with the ID, a resumed job shifts the timestamps the same way
+                        self._update(audio_hash, mode, transcript_id=transcript_id,
+                                     start_offset_ms=start_offset_ms, status="polling")
+                    with span("transcription_wait", transcript_id=transcript_id):
+                        transcript_data = poll_transcription_status(transcript_id, start_offset_ms)
+            except Exception as e:
+                # The heartbeat records when it failed, so waiting sessions can tell this failure from an older one
+                self._update(audio_hash, mode, status="failed", error=str(e), heartbeat=time.time())
+                raise
+
+            result_path = os.path.join(self.results_dir, f"{audio_hash}-{mode}.json")
+            temp_path = f"{result_path}.{self.owner.replace(':', '_')}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(transcript_data, f)
+            os.replace(temp_path, result_path)  # Waiting sessions never see a half written file
+            self._update(audio_hash, mode, status="completed", result_path=result_path, heartbeat=time.time())
+            return transcript_data
+
+    def get_transcript(self, file_path, basic=False, preprocess=False, split=False):
+        """
+        Returns the raw transcript_data for an audio file, transcribing it only if no other session
+        has already done so or is currently doing so.
+        """
+        requested_at = time.time()
+        audio_hash = hash_audio(file_path)
+        # Preprocessing re-encodes the audio, which can change the transcript, so it's part of the key
+        mode = ("basic" if basic else "features") + ("-preprocessed" if preprocess else "") + ("-split" if split else "")
+        with span("single_flight", audio_hash=audio_hash[:12], mode=mode) as flight:
+            waited = False
+            while True:
+                action, job = self._claim(audio_hash, mode, requested_at)
+                if action == "failed":
+                    flight.set(cache="wait")
+                    raise RuntimeError(f"Transcription failed: {job['error']}")
+                if action == "done":
+                    flight.set(cache="wait" if waited else "hit")
+                    with open(job["result_path"], "r", encoding="utf-8") as f:
+                        return json.load(f)
+                if action == "own":
+                    flight.set(cache="miss", resumed=bool(job and job.get("transcript_id")))
+                    return self._run(job, audio_hash, mode, file_path, basic, preprocess, split)
+                if not waited:
+                    print("The same recording is already being transcribed, waiting for that job to finish.")
+                waited = True
+                time.sleep(self.wait_seconds)
+
+    def pending_jobs(self):
+        """
+        Lists the jobs that haven't finished, e.g. to resume them after a restart.
+        """
+        connection = self._connect()
+        connection.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in connection.execute(
+                "SELECT * FROM transcription_jobs WHERE status IN ('submitting', 'polling')"
+            )]
+        finally:
+            connection.close()
+
+def get_audio_intelligence_shared(file_path, basic=False, preprocess=False, split=False, coordinator=None):
+    """
+    Drop-in replacement for get_audio_intelligence that shares jobs and results across sessions.
+    """
+    coordinator = coordinator or TranscriptionCoordinator()
+    return process_transcription_data(coordinator.get_transcript(file_path, basic, preprocess, split))
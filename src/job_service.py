@@ -0,0 +1,285 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import argparse
+import importlib
+import multiprocessing
+from src.job_coordinator import Heartbeat, TranscriptionCoordinator
+from src.assemblyai_processing import process_transcription_data
+from src.tracing import span
+
+# Persistent queue shared by the app and the workers
+QUEUE_DB_PATH = os.getenv("SPEAKERLENS_QUEUE_DB", os.path.join("data", "job_queue.db"))
+# Transcripts and precomputed RAG embeddings of finished jobs
+JOB_RESULTS_DIR = os.path.join("data", "jobs")
+# Import path of the function that turns an audio file into transcript_data. Swap it for a mock in tests.
+DEFAULT_PROVIDER = "src.job_service:transcribe_with_assemblyai"
+# A running job whose worker hasn't sent a heartbeat for this long is put back in the queue
+HEARTBEAT_SECONDS = 10
+STALE_AFTER_SECONDS = 60
+# A job is failed instead of queued again once this many workers have stopped in the middle of it,
+# so a recording that crashes its worker doesn't take down one worker after the other forever
+MAX_ATTEMPTS = 3
+# How long an idle worker waits before checking the queue again
+IDLE_SECONDS = 1
+
+def transcribe_with_assemblyai(audio_path, basic=False, preprocess=False, split=False):
+    """
+    Default transcription provider: AssemblyAI through the single-flight coordinator,
+    so a job for a recording that was already transcribed finishes right away.
+    """
+    return TranscriptionCoordinator().get_transcript(audio_path, basic, preprocess, split)
+
+def load_callable(path):
+    """
+    Resolves a "package.module:function" string. Workers receive providers this way since they may run in a fresh process.
+    """
+    module_name, function_name = path.split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+class JobQueue:
+    """
+    Persistent job queue in a local SQLite file. The app submits jobs and polls their status, the
+    workers claim queued jobs, run the pipeline and store the results. Jobs survive page refreshes
+    and restarts of both the app and the service.
+    """
+    def __init__(self, db_path=QUEUE_DB_PATH, results_dir=JOB_RESULTS_DIR, stale_after=STALE_AFTER_SECONDS,
+                 max_attempts=MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.results_dir = results_dir
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        os.makedirs(results_dir, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    audio_path TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    worker TEXT,
+                    heartbeat REAL,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            # Queues created before attempts were counted get the column here
+            columns = {row["name"] for row in connection.execute("PRAGMA table_info(jobs)")}
+            if "attempts" not in columns:
+                try:
+                    connection.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+                except sqlite3.OperationalError:
+                    pass  # Another process added it in the meantime
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def _connect(self):
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _update(self, job_id, worker=None, **fields):
+        """
+        Updates a job. With a worker, only while that worker still holds the job: a worker whose job was
+        queued again (and maybe claimed by another one) mustn't overwrite its status.
+        """
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        with self._connect() as connection:
+            if worker is None:
+                connection.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", [*fields.values(), job_id])
+            else:
+                connection.execute(f"UPDATE jobs SET {assignments} WHERE id = ? AND worker = ?",
+                                   [*fields.values(), job_id, worker])
+
+    def submit(self, audio_path, basic=False, preprocess=False, split=False):
+        """
+        Queues an audio file for transcription and RAG indexing, returning the job ID right away.
+        """
+        job_id = uuid.uuid4().hex
+        options = {"basic": basic, "preprocess": preprocess, "split": split}
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, audio_path, options, status, stage, created_at) VALUES (?, ?, ?, 'queued', 'queued', ?)",
+                (job_id, os.path.abspath(audio_path), json.dumps(options), time.time())
+            )
+        return job_id
+
+    def get(self, job_id):
+        """
+        Returns the status of a job. This is a single indexed lookup, cheap enough to call on every rerun.
+        """
+        with self._connect() as connection:
+            job = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if job is None:
+            return None
+        job = dict(job)
+        job["options"] = json.loads(job["options"])
+        return job
+
+    def claim_next(self, worker):
+        """
+        Hands the oldest queued job to a worker. Jobs of workers that stopped sending heartbeats are queued again first,
+        or failed once max_attempts workers have stopped in the middle of them.
+        """
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            stale_before = time.time() - self.stale_after
+            connection.execute(
+                "UPDATE jobs SET status = 'failed', stage = 'failed', worker = NULL, finished_at = ?, "
+                "error = 'The worker stopped in the middle of the job ' || attempts || ' times' "
+                "WHERE status = 'running' AND heartbeat < ? AND attempts >= ?",
+                (time.time(), stale_before, self.max_attempts)
+            )
+            connection.execute(
+                "UPDATE jobs SET status = 'queued', stage = 'queued', worker = NULL "
+                "WHERE status = 'running' AND heartbeat < ?",
+                (stale_before,)
+            )
+            job = connection.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if job is not None:
+                now = time.time()
+                connection.execute(
+                    "UPDATE jobs SET status = 'running', stage = 'transcribing', worker = ?, heartbeat = ?, started_at = ?, "
+                    "attempts = attempts + 1 WHERE id = ?",
+                    (worker, now, now, job["id"])
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+        if job is None:
+            return None
+        job = dict(job, status="running", worker=worker, attempts=job["attempts"] + 1)
+        job["options"] = json.loads(job["options"])
+        return job
+
+    def result_path(self, job_id, kind="transcript"):
+        return os.path.join(self.results_dir, f"{job_id}.{kind}.json")
+
+    def _write_result(self, job_id, kind, data):
+        path = self.result_path(job_id, kind)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+
+    def load_result(self, job_id, kind="transcript"):
+        """
+        Loads the stored transcript_data (kind="transcript") or RAG embeddings (kind="embeddings") of a job.
+        Returns None when the job has no such result.
+        """
+        path = self.result_path(job_id, kind)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+def run_job(queue, job, provider, index):
+    """
+    Runs the whole pipeline for a single job: transcription, storing the transcript and RAG indexing.
+    """
+    job_id = job["id"]
+    with span("job", job_id=job_id, **job["options"]):
+        transcript_data = provider(job["audio_path"], **job["options"])
+        queue._write_result(job_id, "transcript", transcript_data)
+
+        if index:
+            queue._update(job_id, job["worker"], stage="indexing")
+            # Imported here so workers running without indexing don't need the RAG dependencies
+            from src.rag_system import embed_chunks
+            transcription, speakers, *_ = process_transcription_data(transcript_data)
+            try:
+                queue._write_result(job_id, "embeddings", embed_chunks(transcription, speakers))
+            except Exception as e:
+                # The transcript is still usable, the app falls back to embedding it itself
+                print(f"RAG indexing failed for job {job_id}: {e}")
+                queue._update(job_id, job["worker"], error=f"Indexing failed: {e}")
+
+def run_worker(db_path=QUEUE_DB_PATH, results_dir=JOB_RESULTS_DIR, provider_path=DEFAULT_PROVIDER,
+               index=True, idle_seconds=IDLE_SECONDS, max_jobs=None,
+               heartbeat_seconds=HEARTBEAT_SECONDS, stale_after=STALE_AFTER_SECONDS, max_attempts=MAX_ATTEMPTS):
+    """
+    Worker loop: claims queued jobs one at a time until stopped (or until max_jobs have been processed).
+    """
+    queue = JobQueue(db_path, results_dir, stale_after, max_attempts)
+    provider = load_callable(provider_path)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        job = queue.claim_next(worker)
+        if job is None:
+            time.sleep(idle_seconds)
+            continue
+        print(f"[{worker}] Processing job {job['id']} ({job['audio_path']})")
+        with Heartbeat(lambda: queue._update(job["id"], worker, heartbeat=time.time()), heartbeat_seconds):
+            try:
+                run_job(queue, job, provider, index)
+                queue._update(job["id"], worker, status="completed", stage="completed", finished_at=time.time())
+            except Exception as e:
+                print(f"[{worker}] Job {job['id']} failed: {e}")
+                queue._update(job["id"], worker, status="failed", stage="failed", error=str(e), finished_at=time.time())
+        processed += 1
+
+class JobService:
+    """
+    Pool of worker processes sharing one job queue. Capacity scales with the number of workers, and
+    several services (even on different machines sharing the data folder) can work off the same queue.
+    """
+    def __init__(self, workers=2, db_path=QUEUE_DB_PATH, results_dir=JOB_RESULTS_DIR,
+                 provider_path=DEFAULT_PROVIDER, index=True, idle_seconds=IDLE_SECONDS,
+                 heartbeat_seconds=HEARTBEAT_SECONDS, stale_after=STALE_AFTER_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.workers = workers
+        self.worker_args = (db_path, results_dir, provider_path, index, idle_seconds, None,
+                            heartbeat_seconds, stale_after, max_attempts)
+        self.processes = []
+
+    def start(self):
+        for _ in range(self.workers):
+            process = multiprocessing.Process(target=run_worker, args=self.worker_args, daemon=True)
+            process.start()
+            self.processes.append(process)
+        return self
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        self.processes = []
+
+    def join(self):
+        for process in self.processes:
+            process.join()
+
+def main(argv=None):
+    """
+    Command line entry point, e.g. `python -m src.job_service --workers 4`
+    """
+    parser = argparse.ArgumentParser(description="Run the SpeakerLens background job service.")
+    parser.add_argument("--workers", type=int, default=2, help="Number of worker processes")
+    parser.add_argument("--provider", default=DEFAULT_PROVIDER, help="Transcription provider as module:function")
+    parser.add_argument("--no-index", action="store_true", help="Skip precomputing the RAG embeddings")
+    args = parser.parse_args(argv)
+
+    service = JobService(args.workers, provider_path=args.provider, index=not args.no_index).start()
+    print(f"Job service running with {args.workers} worker(s). Press Ctrl+C to stop.")
+    try:
+        service.join()
+    except KeyboardInterrupt:
+        service.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+import os
+import tempfile
+import contextvars
+import subprocess
+from string import ascii_uppercase
+from concurrent.futures import ThreadPoolExecutor
+from src.assemblyai_processing import (
+    upload_audio,
+    transcribe_basic_audio,
+    transcribe_audio_with_features,
+    poll_transcription_status,
+    process_transcription_data,
+    prepared_upload,
+    shift_timestamps,
+    submit_audio
+)
+from src.audio_preprocessing import FFMPEG_BINARY, detect_silences
+from src.tracing import span, traced
+
+# Target length of every segment. Each segment becomes its own AssemblyAI job, so the wall time
+# of the whole transcription follows this rather than the length of the recording.
+SEGMENT_SECONDS = 15 * 60
+# Every segment also starts this much earlier than its cut point. The audio both jobs transcribed
+# is used to work out which speaker labels of the two segments belong to the same person.
+OVERLAP_SECONDS = 60
+# How far away from the target a cut point may move to land on a silence
+SEARCH_WINDOW_SECONDS = 90
+# An utterance of the previous segment that ends this close to a cut counts as cut off by it
+CUT_OFF_SLACK_MS = 1000
+# A remainder shorter than this fraction of a segment stays part of the last segment instead of becoming a
+# tiny one of its own, so recordings up to (1 + LAST_SEGMENT_FRACTION) * SEGMENT_SECONDS are a single job
+LAST_SEGMENT_FRACTION = 0.25
+
+def plan_segments(duration, silences, segment_seconds=SEGMENT_SECONDS, overlap_seconds=OVERLAP_SECONDS,
+                  search_window=SEARCH_WINDOW_SECONDS):
+    """
+    Splits a recording into segments of roughly segment_seconds, cutting in the middle of the silence
+    closest to every target point. Returns a list of (audio_start, own_start, end) tuples in seconds:
+    the segment's audio runs from audio_start to end, but only what starts after own_start is kept.
+    """
+    cuts = []
+    target = segment_seconds
+    while target < duration - segment_seconds * LAST_SEGMENT_FRACTION:
+        candidates = [(start + end) / 2 for start, end in silences
+                      if abs((start + end) / 2 - target) <= search_window]
+        cut = min(candidates, key=lambda c: abs(c - target)) if candidates else target
+        cuts.append(cut)
+        target = cut + segment_seconds
+
+    boundaries = [0.0] + cuts + [duration]
+    return [
+        (max(0.0, own_start - overlap_seconds) if i else 0.0, own_start, end)
+        for i, (own_start, end) in enumerate(zip(boundaries, boundaries[1:]))
+    ]
+
+def extract_segment(file_path, start, end, output_path):
+    """
+    Copies a time range of the audio into its own file without re-encoding it.
+    """
+    result = subprocess.run(
+        [FFMPEG_BINARY, "-hide_banner", "-nostdin", "-y", "-ss", f"{start:.3f}", "-i", file_path,
+         "-t", f"{end - start:.3f}", "-c", "copy", output_path],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to extract segment: {result.stderr.strip()[-500:]}")
+    return output_path
+
+def transcribe_segment(audio_url, basic=False, segment=0):
+    """
+    Runs the usual transcribe -> poll steps for a single uploaded segment.
+    """
+    with span("segment_transcription", segment=segment):
+        transcript_id = transcribe_basic_audio(audio_url) if basic else transcribe_audio_with_features(audio_url)
+        return poll_transcription_status(transcript_id)
+
+def _trimmed_silences(duration, silences, stats):
+    """
+    Moves the silences of the original recording onto the timeline of its preprocessed version,
+    which starts start_offset seconds later and is trimmed_seconds shorter.
+    """
+    offset = stats["start_offset"]
+    trimmed_duration = duration - stats["trimmed_seconds"]
+    return trimmed_duration, [
+        (max(0.0, start - offset), min(trimmed_duration, end - offset))
+        for start, end in silences
+        if end - offset > 0 and start - offset < trimmed_duration
+    ]
+
+def _speaker_label(index):
+    """
+    A, B, ..., Z, AA, AB, ... just like AssemblyAI names its speakers.
+    """
+    label = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        label = ascii_uppercase[remainder] + label
+    return label
+
+def _shift(item, offset_ms, speaker_map=None):
+    """
+    Copies a timestamped item (utterance, word, sentiment result, entity) into the merged timeline.
+    """
+    shifted = dict(item)
+    for key in ("start", "end"):
+        if shifted.get(key) is not None:
+            shifted[key] += offset_ms
+    if "timestamp" in shifted:
+        shifted["timestamp"] = {key: value + offset_ms for key, value in shifted["timestamp"].items()}
+    if speaker_map is not None and shifted.get("speaker") is not None:
+        shifted["speaker"] = speaker_map.get(shifted["speaker"], shifted["speaker"])
+    if "words" in shifted:
+        shifted["words"] = [_shift(word, offset_ms, speaker_map) for word in shifted["words"]]
+    return shifted
+
+def _starts_after(item, start_ms):
+    start = item["timestamp"]["start"] if "timestamp" in item else item["start"]
+    return start >= start_ms
+
+def _timed_words(utterances, window_start, window_end):
+    """
+    Returns (start, end, speaker) for every word inside the overlap window.
+    """
+    return [
+        (word["start"], word["end"], utterance["speaker"])
+        for utterance in utterances
+        for word in utterance.get("words") or [utterance]  # Fall back to the utterance if there are no words
+        if word["end"] > window_start and word["start"] < window_end
+    ]
+
+def match_speakers(previous_utterances, segment_utterances, window_start, window_end, used_labels):
+    """
+    Maps the speaker labels of a segment onto the labels used so far. Both jobs transcribed the overlap
+    window, so the labels that talk at the same time inside it belong to the same speaker. Labels are paired
+    greedily by how much their speech overlaps. If exactly one label is left on both sides (someone who
+    didn't talk during the overlap) they are paired by elimination, any other label gets a new global label.
+    """
+    previous_words = _timed_words(previous_utterances, window_start, window_end)
+    segment_words = _timed_words(segment_utterances, window_start, window_end)
+
+    agreement = {}
+    for start, end, local_label in segment_words:
+        for other_start, other_end, global_label in previous_words:
+            overlap = min(end, other_end) - max(start, other_start)
+            if overlap > 0:
+                key = (local_label, global_label)
+                agreement[key] = agreement.get(key, 0) + overlap
+
+    speaker_map = {}
+    taken = set()
+    for (local_label, global_label), _ in sorted(agreement.items(), key=lambda x: x[1], reverse=True):
+        if local_label not in speaker_map and global_label not in taken:
+            speaker_map[local_label] = global_label
+            taken.add(global_label)
+
+    unmatched = list(dict.fromkeys(u["speaker"] for u in segment_utterances if u["speaker"] not in speaker_map))
+    free = {u["speaker"] for u in previous_utterances} - taken
+    if len(unmatched) == 1 and len(free) == 1:
+        speaker_map[unmatched[0]] = free.pop()
+
+    next_index = len(used_labels)
+    for utterance in segment_utterances:
+        if utterance["speaker"] not in speaker_map:
+            while _speaker_label(next_index) in used_labels:
+                next_index += 1
+            speaker_map[utterance["speaker"]] = _speaker_label(next_index)
+            used_labels.add(speaker_map[utterance["speaker"]])
+    return speaker_map
+
+def _continue_cut_utterances(merged_utterances, utterances, cut_ms):
+    """
+    Keeps the words said after a cut by the utterances that cross it. When the cut didn't land on a silence,
+    the previous segment's audio stops in the middle of an utterance, but this segment starts earlier and
+    has all of it. The words after the cut are added to that speaker's cut off utterance, or become an
+    utterance of their own. Returns the new utterances and the words added to existing ones.
+    """
+    new_utterances, added_words = [], []
+    for utterance in utterances:
+        if utterance["start"] >= cut_ms or utterance["end"] <= cut_ms:
+            continue
+        words = [word for word in utterance.get("words") or [] if word["start"] >= cut_ms]
+        if not words:
+            continue
+        text = " ".join(word["text"] for word in words)
+        cut_off = next((u for u in reversed(merged_utterances)
+                        if u["speaker"] == utterance["speaker"] and u["end"] >= cut_ms - CUT_OFF_SLACK_MS), None)
+        if cut_off is not None:
+            cut_off["words"] = (cut_off.get("words") or []) + words
+            cut_off["text"] = f"{cut_off['text']} {text}"
+            cut_off["end"] = max(cut_off["end"], words[-1]["end"])
+            added_words.extend(words)
+        else:
+            new_utterances.append({**utterance, "start": words[0]["start"], "text": text, "words": words})
+    return new_utterances, added_words
+
+def merge_transcripts(results, segments):
+    """
+    Stitches the transcripts of the segments back into a single transcript_data, offsetting every
+    timestamp by the segment start, dropping the duplicated overlap audio and reconciling speaker labels.
+    """
+    merged = {key: [] for key in ("utterances", "words", "entities", "sentiment_analysis_results")}
+    topic_results, safety_results, summaries = [], [], []
+    topic_scores, safety_scores = {}, {}
+    used_labels = set()
+    previous_utterances = []
+    total_duration = segments[-1][2]
+
+    for transcript_data, (audio_start, own_start, end) in zip(results, segments):
+        offset_ms = int(audio_start * 1000)
+        own_start_ms = int(own_start * 1000)
+        utterances = [_shift(utterance, offset_ms) for utterance in transcript_data.get("utterances") or []]
+
+        if previous_utterances:
+            speaker_map = match_speakers(previous_utterances, utterances, offset_ms, own_start_ms, used_labels)
+        else:
+            speaker_map = {u["speaker"]: u["speaker"] for u in utterances}
+            used_labels.update(speaker_map.values())
+        utterances = [_shift(utterance, 0, speaker_map) for utterance in utterances]
+
+        # The overlap audio belongs to the previous segment, only keep what starts after the cut point,
+        # plus the end of the utterances the previous segment's audio cut off
+        kept_utterances = [u for u in utterances if _starts_after(u, own_start_ms)]
+        if previous_utterances:
+            continued, added_words = _continue_cut_utterances(merged["utterances"], utterances, own_start_ms)
+            merged["words"].extend(added_words)
+            kept_utterances = sorted(continued + kept_utterances, key=lambda u: u["start"])
+        merged["utterances"].extend(kept_utterances)
+        merged["words"].extend(word for u in kept_utterances for word in u.get("words", []))
+        for key in ("entities", "sentiment_analysis_results"):
+            items = (_shift(item, offset_ms, speaker_map) for item in transcript_data.get(key) or [])
+            merged[key].extend(item for item in items if _starts_after(item, own_start_ms))
+        for target, source in ((topic_results, "iab_categories_result"), (safety_results, "content_safety_labels")):
+            items = (_shift(item, offset_ms) for item in transcript_data.get(source, {}).get("results", []))
+            target.extend(item for item in items if _starts_after(item, own_start_ms))
+
+        # Topic relevance is averaged weighted by segment length, content safety keeps the worst score
+        weight = (end - own_start) / total_duration if total_duration else 0
+        for topic, score in transcript_data.get("iab_categories_result", {}).get("summary", {}).items():
+            topic_scores[topic] = topic_scores.get(topic, 0) + score * weight
+        for category, score in transcript_data.get("content_safety_labels", {}).get("summary", {}).items():
+            safety_scores[category] = max(safety_scores.get(category, 0), score)
+        if transcript_data.get("summary"):
+            summaries.append(transcript_data["summary"].strip())
+
+        previous_utterances = utterances
+
+    merged.update({
+        "id": results[0].get("id") if results else None,
+        "segment_ids": [transcript_data.get("id") for transcript_data in results],
+        "status": "completed",
+        "text": " ".join(utterance["text"] for utterance in merged["utterances"]),
+        "audio_duration": total_duration,
+        "iab_categories_result": {"results": topic_results, "summary": topic_scores},
+        "content_safety_labels": {"results": safety_results, "summary": safety_scores}
+    })
+    if summaries:
+        merged["summary"] = "\n".join(summaries)
+    return merged
+
+def transcribe_parallel(file_path, basic=False, preprocess=False, segment_seconds=SEGMENT_SECONDS,
+                        overlap_seconds=OVERLAP_SECONDS, max_workers=None):
+    """
+    Splits long recordings at silences, transcribes the segments as concurrent jobs and returns the
+    merged (raw) transcript_data. Short files, and every file when ffmpeg isn't available, are sent as a single job.
+    """
+    try:
+        duration, silences = detect_silences(file_path)
+        segments = plan_segments(duration, silences, segment_seconds, overlap_seconds)
+    except (FileNotFoundError, RuntimeError) as e:
+        print(f"Can't split the recording, transcribing it as a single job: {e}")
+        segments = None
+    if segments is None or len(segments) == 1:
+        transcript_id, start_offset_ms = submit_audio(file_path, basic, preprocess)
+        with span("transcription_wait", transcript_id=transcript_id):
+            return poll_transcription_status(transcript_id, start_offset_ms)
+
+    # Compress once up front and split the smaller file
+    with prepared_upload(file_path, preprocess) as upload:
+        if upload["stats"]:
+            # Trimming the silence shifts the timeline, the cut points are planned on the processed file
+            duration, silences = _trimmed_silences(duration, silences, upload["stats"])
+            segments = plan_segments(duration, silences, segment_seconds, overlap_seconds)
+        print(f"Splitting {duration / 60:.1f} minutes of audio into {len(segments)} segments for parallel transcription.")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            _, extension = os.path.splitext(upload["path"])
+            segment_paths = [
+                extract_segment(upload["path"], audio_start, end, os.path.join(temp_dir, f"segment_{i:03d}{extension}"))
+                for i, (audio_start, _, end) in enumerate(segments)
+            ]
+            with ThreadPoolExecutor(max_workers=max_workers or len(segment_paths)) as executor:
+                futures = [executor.submit(contextvars.copy_context().run, upload_audio, path) for path in segment_paths]
+                audio_urls = [future.result() for future in futures]
+
+    # The jobs spend nearly all their time waiting on AssemblyAI, so threads are enough here.
+    # Every job runs in a copy of the current context so its spans end up in the same trace.
+    with ThreadPoolExecutor(max_workers=max_workers or len(audio_urls)) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, transcribe_segment, audio_url, basic, i)
+                   for i, audio_url in enumerate(audio_urls)]
+        results = [future.result() for future in futures]
+
+    with span("merge_segments", segments=len(results)):
+        merged = merge_transcripts(results, segments)
+    return shift_timestamps(merged, upload["start_offset_ms"])
+
+@traced("audio_intelligence_parallel")
+def get_audio_intelligence_parallel(file_path, basic=False, preprocess=False, segment_seconds=SEGMENT_SECONDS,
+                                    overlap_seconds=OVERLAP_SECONDS, max_workers=None):
+    """
+    Same as get_audio_intelligence, but long recordings are split at silences and the segments are
+    transcribed as concurrent jobs before being merged back together.
+    """
+    transcript_data = transcribe_parallel(file_path, basic, preprocess, segment_seconds, overlap_seconds, max_workers)
+    return process_transcription_data(transcript_data)
@@ -1,4 +1,5 @@
 import os
+import uuid
 from typing import List, Dict
 from dotenv import load_dotenv
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -7,14 +8,86 @@ from langchain_community.vectorstores import Chroma
 from langchain.chains import ConversationalRetrievalChain
 from langchain.prompts import PromptTemplate
 from langchain.memory import ConversationBufferMemory
+from langchain_core.embeddings import Embeddings
+from langchain_core.callbacks import BaseCallbackHandler
+from src.tracing import span, start_span
 
 # Load environment variables
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-class TranscriptRAG:
+class TracedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings model so every embedding call shows up as a span.
+    """
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with span("embedding", texts=len(texts), chars=sum(len(text) for text in texts)):
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with span("embedding", texts=1, chars=len(text), query=True):
+            return self.embeddings.embed_query(text)
+
+class PrecomputedEmbeddings(Embeddings):
+    """
+    Serves vectors that were computed earlier (e.g. by a job service worker) for the texts it knows,
+    and falls back to the wrapped model for anything else, such as the questions asked.
+    """
+    def __init__(self, embeddings, vectors: Dict[str, List[float]]):
+        self.embeddings = embeddings
+        self.vectors = vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        missing = [text for text in texts if text not in self.vectors]
+        if missing:
+            self.vectors.update(zip(missing, self.embeddings.embed_documents(missing)))
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Turns LangChain's retriever and LLM callbacks into retrieval and llm_generation spans, including token counts.
+    """
     def __init__(self):
-        self.embeddings = OpenAIEmbeddings()
+        self.spans = {}
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self.spans[run_id] = start_span("retrieval", chars=len(query))
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self.spans.pop(run_id).set(documents=len(documents)).finish()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self.spans[run_id] = start_span("llm_generation", prompt_chars=sum(len(prompt) for prompt in prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        prompt_chars = sum(len(str(message.content)) for batch in messages for message in batch)
+        self.spans[run_id] = start_span("llm_generation", prompt_chars=prompt_chars)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        token_usage = (response.llm_output or {}).get("token_usage", {})
+        self.spans.pop(run_id).set(
+            model=(response.llm_output or {}).get("model_name"),
+            prompt_tokens=token_usage.get("prompt_tokens"),
+            completion_tokens=token_usage.get("completion_tokens"),
+            total_tokens=token_usage.get("total_tokens")
+        ).finish()
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self.spans.pop(run_id).set(error=repr(error)).finish()
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self.spans.pop(run_id).set(error=repr(error)).finish()
+
+class TranscriptRAG:
+    def __init__(self, embeddings=None, llm=None):
+        # Embeddings and LLM can be swapped out (e.g. for fake ones in benchmarks), OpenAI is used by default
+        self.embeddings = TracedEmbeddings(embeddings or OpenAIEmbeddings())
         # Breaking up the text into smaller pieces (chunks) so it's easier to search through and answer questions.
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=2500, #Size of each chunk, feel free to modify this. Make sure it's not too small or too large.
@@ -24,7 +97,8 @@ class TranscriptRAG:
             separators=["\n\n", "\n", " ", ""]
         )
         # Using GPT-4 for better answers
-        self.llm = ChatOpenAI(temperature=0.7, model="gpt-4-turbo-preview")
+        self.llm = llm or ChatOpenAI(temperature=0.7, model="gpt-4-turbo-preview")
+        self.vector_store = None
         # Keeping track of the covnersation history
         self.memory = ConversationBufferMemory(
             memory_key="chat_history",
@@ -35,38 +109,53 @@ class TranscriptRAG:
         """
         Chunking the transrcipt into smaller pieces.
         """
-        documents = []
-        
-        # Process full transcription
-        full_transcript_chunks = self.text_splitter.create_documents(
-            [transcription],
-            metadatas=[{"source": "full_transcript", "type": "complete"}]
-        )
-        documents.extend(full_transcript_chunks)
+        with span("chunking", chars=len(transcription)) as chunking:
+            documents = []
         
-        # Process speaker-wise transcripts
-        for speaker, data in speakers_data.items():
-            speaker_chunks = self.text_splitter.create_documents(
-                [data["text"]],
-                metadatas=[{
-                    "source": "speaker_transcript",
-                    "speaker": speaker,
-                    "type": "speaker_specific"
-                }]
+            # Process full transcription
+            full_transcript_chunks = self.text_splitter.create_documents(
+                [transcription],
+                metadatas=[{"source": "full_transcript", "type": "complete"}]
             )
-            documents.extend(speaker_chunks)
+            documents.extend(full_transcript_chunks)
+        
+            # Process speaker-wise transcripts
+            for speaker, data in speakers_data.items():
+                speaker_chunks = self.text_splitter.create_documents(
+                    [data["text"]],
+                    metadatas=[{
+                        "source": "speaker_transcript",
+                        "speaker": speaker,
+                        "type": "speaker_specific"
+                    }]
+                )
+                documents.extend(speaker_chunks)
+            chunking.set(chunks=len(documents))
         
         return documents
 
-    def create_vector_store(self, documents):
+    def create_vector_store(self, documents, persist_directory=None):
         """
      Store our text chunks in a Chrome vector database. This can be changed to any other vector database like FAISS etc.
+     The store is kept in memory in a collection of its own, so a rebuild for another transcript starts out empty.
         """
-        return Chroma.from_documents(
-            documents=documents,
-            embedding=self.embeddings,
-            persist_directory="./data/vectorstore"
-        )
+        self.close()
+        with span("indexing", documents=len(documents)):
+            self.vector_store = Chroma.from_documents(
+                documents=documents,
+                embedding=self.embeddings,
+                collection_name=f"transcript_{uuid.uuid4().hex}",
+                persist_directory=persist_directory
+            )
+        return self.vector_store
+
+    def close(self):
+        """
+        Drops the vector store of this transcript.
+        """
+        if self.vector_store is not None:
+            self.vector_store.delete_collection()
+            self.vector_store = None
 
     def setup_retriever(self, vector_store):
         """
@@ -132,7 +221,8 @@ class TranscriptRAG:
         """
         Takes a question and returns both an answer and where it found the information
         """
-        result = qa_chain({"question": question})
+        with span("rag_query", chars=len(question)):
+            result = qa_chain({"question": question}, callbacks=[TracingCallbackHandler()])
         
         # Extract source information
         sources = []
@@ -148,14 +238,28 @@ class TranscriptRAG:
             "sources": sources
         }
 
-def initialize_rag_system(transcription: str, speakers_data: Dict):
+def embed_chunks(transcription: str, speakers_data: Dict, embeddings=None) -> Dict:
+    """
+    Chunks and embeds a transcript ahead of time, so the vectors can be stored and reused later
+    through initialize_rag_system(..., embedded_chunks=...) without calling the embeddings API again.
+    """
+    rag = TranscriptRAG(embeddings=embeddings)
+    texts = [document.page_content for document in rag.prepare_documents(transcription, speakers_data)]
+    return {"texts": texts, "embeddings": rag.embeddings.embed_documents(texts)}
+
+def initialize_rag_system(transcription: str, speakers_data: Dict, embedded_chunks: Dict = None):
     """
     Setting up the whole system
     """
-    rag = TranscriptRAG()
-    documents = rag.prepare_documents(transcription, speakers_data)
-    vector_store = rag.create_vector_store(documents)
-    retriever = rag.setup_retriever(vector_store)
-    qa_chain = rag.setup_qa_chain(retriever)
+    with span("rag_initialize", precomputed=embedded_chunks is not None):
+        embeddings = None
+        if embedded_chunks:
+            vectors = dict(zip(embedded_chunks["texts"], embedded_chunks["embeddings"]))
+            embeddings = PrecomputedEmbeddings(OpenAIEmbeddings(), vectors)
+        rag = TranscriptRAG(embeddings=embeddings)
+        documents = rag.prepare_documents(transcription, speakers_data)
+        vector_store = rag.create_vector_store(documents)
+        retriever = rag.setup_retriever(vector_store)
+        qa_chain = rag.setup_qa_chain(retriever)
     
     return rag, qa_chain 
\ No newline at end of file
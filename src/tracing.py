@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# Spans are only exported when SPEAKERLENS_TRACE_FILE names a JSON-lines file to append them to.
+# Once the file reaches MAX_TRACE_FILE_BYTES it's moved to "<file>.1" (replacing the previous one) and a new one is started.
+# Several processes can share the file, only the first one to notice it's full rotates it.
+TRACE_FILE = os.getenv("SPEAKERLENS_TRACE_FILE") or None
+MAX_TRACE_FILE_BYTES = 50 * 1024 * 1024
+# The most recent spans are also kept in memory for the debug panel in the app
+MAX_RECENT_SPANS = 2000
+
+_current_span = contextvars.ContextVar("speakerlens_current_span", default=None)
+_recent_spans = deque(maxlen=MAX_RECENT_SPANS)
+_lock = threading.Lock()
+_trace_file = None
+
+class Span:
+    """
+    A single timed stage of the pipeline. Attributes hold anything worth knowing about the stage,
+    e.g. byte counts, token counts or whether a cache was hit.
+    """
+    def __init__(self, name, parent=None, **attributes):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    def finish(self):
+        if self.duration_ms is None:
+            self.duration_ms = round((time.perf_counter() - self._start) * 1000, 3)
+            _export(self)
+        return self
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes
+        }
+
+def _export(finished_span):
+    global _trace_file
+    record = finished_span.to_dict()
+    with _lock:
+        _recent_spans.append(record)
+        if not TRACE_FILE:
+            return
+        # The file is kept open between spans instead of being reopened for every one of them,
+        # unless another process sharing it has rotated it since
+        if _trace_file is not None and _inode(TRACE_FILE) != os.fstat(_trace_file.fileno()).st_ino:
+            _trace_file.close()
+            _trace_file = None
+        if _trace_file is None:
+            os.makedirs(os.path.dirname(TRACE_FILE) or ".", exist_ok=True)
+            _trace_file = open(TRACE_FILE, "a", encoding="utf-8")
+        _trace_file.write(json.dumps(record, default=str) + "\n")
+        _trace_file.flush()
+        if _trace_file.tell() >= MAX_TRACE_FILE_BYTES:
+            _rotate()
+
+def _inode(path):
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+def _rotate():
+    global _trace_file
+    # Only rename the file this handle points at: if another process rotated it in the meantime,
+    # renaming again would replace the spans it just rotated
+    inode = os.fstat(_trace_file.fileno()).st_ino
+    _trace_file.close()
+    _trace_file = None
+    if _inode(TRACE_FILE) == inode:
+        try:
+            os.replace(TRACE_FILE, f"{TRACE_FILE}.1")
+        except FileNotFoundError:
+            pass  # Another process rotated it a moment ago
+
+def set_trace_file(path):
+    """
+    Turns the export on (or off, with None) at runtime, e.g. so benchmarks don't measure writing spans to disk.
+    """
+    global TRACE_FILE, _trace_file
+    with _lock:
+        if _trace_file is not None:
+            _trace_file.close()
+            _trace_file = None
+        TRACE_FILE = path or None
+
+def current_span():
+    return _current_span.get()
+
+def start_span(name, **attributes):
+    """
+    Starts a span under the current one without making it current. Meant for callbacks where the start and
+    end of a stage happen in different functions, the caller has to call finish() on it.
+    """
+    return Span(name, _current_span.get(), **attributes)
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Times the code inside the `with` block. Spans opened inside it (in the same thread) become its children.
+    """
+    new_span = start_span(name, **attributes)
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except Exception as e:
+        new_span.set(error=repr(e))
+        raise
+    finally:
+        _current_span.reset(token)
+        new_span.finish()
+
+def traced(name=None):
+    """
+    Decorator version of span(), the span is named after the function unless a name is given.
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name or function.__name__):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def begin_trace(name, **attributes):
+    """
+    Starts a new trace and makes its root span current for the rest of the thread, e.g. a Streamlit script run.
+    """
+    root = Span(name, None, **attributes)
+    _current_span.set(root)
+    return root
+
+def end_trace(root):
+    _current_span.set(None)
+    return root.finish()
+
+def recent_spans(trace_id=None):
+    """
+    Returns the finished spans kept in memory, optionally only those of a single trace.
+    """
+    with _lock:
+        spans = list(_recent_spans)
+    if trace_id is not None:
+        spans = [s for s in spans if s["trace_id"] == trace_id]
+    return spans
@@ -0,0 +1,479 @@
+import os
+import io
+import json
+import mmap
+import time
+import struct
+import argparse
+import numpy as np
+import pandas as pd
+import zstandard
+
+# Compact on-disk format for archived transcripts (.sltr files). Layout:
+#   preamble (magic, format version, flags, header length)
+#   header   (zstd compressed JSON: dictionaries, table layout and the byte range of every block)
+#   data     (zstd compressed column blocks, plus the metadata and full text sections)
+# Words, utterances, sentiment results and entities are stored as columnar tables. Their rows are grouped in
+# blocks of BLOCK_MS of audio, so reading a time range only decompresses the blocks that overlap it.
+MAGIC = b"SLTR"
+FORMAT_VERSION = 1
+ARCHIVE_EXTENSION = ".sltr"
+ARCHIVE_DIR = os.path.join("data", "archive")
+BLOCK_MS = 5 * 60 * 1000
+COMPRESSION_LEVEL = 9
+_PREAMBLE = struct.Struct("<4sHHQ")
+
+# Table name -> transcript_data key and the columns kept for every row, in the order AssemblyAI returns them.
+# "time" columns are delta encoded, "text" columns are stored as one UTF-8 blob plus string lengths,
+# and speaker, sentiment and entity_type values are dictionary encoded. Any other per-row fields are dropped.
+TABLES = {
+    "words": ("words", {"text": "text", "start": "time", "end": "time", "confidence": "float32", "speaker": "speaker"}),
+    "utterances": ("utterances", {"confidence": "float32", "end": "time", "speaker": "speaker", "start": "time",
+                                  "text": "text", "word_start": "uint32", "word_count": "uint32"}),
+    "sentiment": ("sentiment_analysis_results", {"text": "text", "start": "time", "end": "time",
+                                                 "sentiment": "sentiment", "confidence": "float32", "speaker": "speaker"}),
+    "entities": ("entities", {"entity_type": "entity_type", "text": "text", "start": "time", "end": "time"})
+}
+DICTIONARY_COLUMNS = ("speaker", "sentiment", "entity_type")
+
+def _word_key(word):
+    return word["start"], word["end"], word.get("speaker"), word["text"]
+
+def _utterance_word_ranges(utterances, words):
+    """
+    Locates the words of every utterance in the words table, so they aren't stored twice.
+    Returns None when the words of an utterance aren't a run of the table.
+    """
+    positions = {}
+    for position, word in enumerate(words):
+        positions.setdefault(_word_key(word), position)
+    word_count = np.array([len(u.get("words") or []) for u in utterances], dtype=np.int64)
+    word_start = np.zeros(len(utterances), dtype=np.int64)
+    for i, (utterance, count) in enumerate(zip(utterances, word_count)):
+        if not count:
+            continue
+        start = positions.get(_word_key(utterance["words"][0]))
+        if start is None or [_word_key(word) for word in words[start:start + count]] != \
+                [_word_key(word) for word in utterance["words"]]:
+            return None
+        word_start[i] = start
+    return word_start, word_count
+
+def _encode_columns(rows, columns, dictionaries, extra):
+    """
+    Turns a list of row dicts into column arrays, with dictionary encoded values replaced by their codes.
+    """
+    encoded = {}
+    for column, kind in columns.items():
+        if column in extra:
+            encoded[column] = extra[column]
+        elif kind == "time":
+            encoded[column] = np.fromiter((row[column] for row in rows), dtype=np.int64, count=len(rows))
+        elif kind == "float32":
+            encoded[column] = np.array([np.nan if row.get(column) is None else row[column] for row in rows], dtype=np.float32)
+        elif kind == "text":
+            encoded[column] = [row.get(column) or "" for row in rows]
+        else:
+            codes = dictionaries.setdefault(kind, {})
+            encoded[column] = np.fromiter((codes.setdefault(row.get(column), len(codes)) for row in rows),
+                                          dtype=np.uint16, count=len(rows))
+    return encoded
+
+def _write_section(out, compressor, data):
+    offset = out.tell()
+    out.write(compressor.compress(data))
+    return [offset, out.tell() - offset]
+
+def _write_table(out, compressor, columns, encoded, block_ms):
+    """
+    Writes a table block by block and returns its layout for the header. Rows keep their original order,
+    a block is a run of rows starting in the same BLOCK_MS window (overlapping speech can start a new run early).
+    """
+    starts = encoded["start"]
+    block_ids = starts // block_ms
+    boundaries = [0, *(np.flatnonzero(np.diff(block_ids)) + 1).tolist(), len(starts)]
+    blocks = []
+    for first, last in zip(boundaries[:-1], boundaries[1:]):
+        if first == last:
+            continue
+        block_starts = starts[first:last]
+        block = {"start": int(block_starts.min()), "end": int(encoded["end"][first:last].max()),
+                 "row_offset": first, "rows": last - first, "columns": {}}
+        for column, kind in columns.items():
+            values = encoded[column][first:last]
+            if column == "start":
+                data = np.diff(block_starts, prepend=0).astype("<i4").tobytes()
+            elif column == "end":
+                data = (values - block_starts).astype("<i4").tobytes()
+            elif kind == "text":
+                block["columns"][f"{column}:lengths"] = _write_section(
+                    out, compressor, np.array([len(text) for text in values], dtype="<u4").tobytes())
+                data = "".join(values).encode("utf-8")
+            elif kind == "float32":
+                data = values.astype("<f4").tobytes()
+            elif kind == "uint32":
+                data = values.astype("<u4").tobytes()
+            else:
+                data = values.astype("<u2").tobytes()
+            block["columns"][column] = _write_section(out, compressor, data)
+        blocks.append(block)
+    return {"rows": len(starts), "columns": columns, "blocks": blocks}
+
+def save_transcript(transcript_data, path, block_ms=BLOCK_MS, level=COMPRESSION_LEVEL):
+    """
+    Archives a raw transcript_data payload in the compact format and returns the size of the file in bytes.
+    """
+    compressor = zstandard.ZstdCompressor(level=level)
+    dictionaries = {}
+    data = io.BytesIO()
+    tables = {}
+
+    # The words of every utterance are also listed at the top level, they are stored once and linked by position.
+    # When there are no top-level words, or they don't contain the words of every utterance, the table holds
+    # the utterance words and the top-level ones are kept as they are in the metadata.
+    utterances = transcript_data.get("utterances")
+    words = transcript_data.get("words")
+    word_ranges = _utterance_word_ranges(utterances, words) if words and utterances else None
+    top_level_words = bool(words) and (word_ranges is not None or not utterances)
+    if not top_level_words and utterances:
+        words = [word for utterance in utterances for word in utterance.get("words") or []]
+        word_count = np.array([len(u.get("words") or []) for u in utterances], dtype=np.int64)
+        word_ranges = np.cumsum(word_count) - word_count, word_count
+
+    # Tables that are missing (e.g. utterances without speaker labels) stay in the metadata as null
+    metadata = {key: value for key, value in transcript_data.items()
+                if key != "text" and (key not in [key for key, _ in TABLES.values()] or value is None)}
+    if not top_level_words and "words" in transcript_data:
+        metadata["words"] = transcript_data["words"]
+
+    for name, (key, columns) in TABLES.items():
+        rows = words if name == "words" else transcript_data.get(key)
+        if rows is None:
+            continue
+        extra = {}
+        if name == "utterances":
+            extra["word_start"], extra["word_count"] = word_ranges
+        encoded = _encode_columns(rows, columns, dictionaries, extra)
+        tables[name] = _write_table(data, compressor, columns, encoded, block_ms)
+
+    sections = {}
+    if isinstance(transcript_data.get("text"), str):
+        sections["text"] = _write_section(data, compressor, transcript_data["text"].encode("utf-8"))
+    else:
+        metadata["text"] = transcript_data.get("text")
+    sections["metadata"] = _write_section(data, compressor, json.dumps(metadata).encode("utf-8"))
+
+    header = compressor.compress(json.dumps({
+        "version": FORMAT_VERSION,
+        "block_ms": block_ms,
+        "top_level_words": top_level_words,
+        "dictionaries": {kind: list(codes) for kind, codes in dictionaries.items()},
+        "tables": tables,
+        "sections": sections
+    }).encode("utf-8"))
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.tmp", "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, 0, len(header)))
+        f.write(header)
+        f.write(data.getbuffer())
+    os.replace(f"{path}.tmp", path)
+    return os.path.getsize(path)
+
+class TranscriptArchive:
+    """
+    Read access to an archived transcript. The file is memory-mapped and only the header is decoded when
+    it's opened, tables (or time ranges of them) are decompressed on demand.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, header_length = _PREAMBLE.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a SpeakerLens transcript archive")
+        if version > FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path} uses archive format version {version}, "
+                             f"this version of SpeakerLens reads up to version {FORMAT_VERSION}")
+        self.version = version
+        self._decompressor = zstandard.ZstdDecompressor()
+        self._data_start = _PREAMBLE.size + header_length
+        self.header = json.loads(self._decompressor.decompress(self._map[_PREAMBLE.size:self._data_start]))
+        self.dictionaries = self.header["dictionaries"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _read(self, section):
+        offset, length = section
+        start = self._data_start + offset
+        return self._decompressor.decompress(self._map[start:start + length])
+
+    def metadata(self):
+        """
+        Everything in transcript_data besides the tables and the full text, e.g. the summary, topics and content safety.
+        """
+        return json.loads(self._read(self.header["sections"]["metadata"]))
+
+    def text(self):
+        section = self.header["sections"].get("text")
+        return self._read(section).decode("utf-8") if section else self.metadata().get("text")
+
+    def time_range(self):
+        """
+        (first start, last end) in milliseconds over all tables, read from the header alone.
+        """
+        blocks = [block for table in self.header["tables"].values() for block in table["blocks"]]
+        if not blocks:
+            return 0, 0
+        return min(block["start"] for block in blocks), max(block["end"] for block in blocks)
+
+    def table(self, name, start_ms=None, end_ms=None):
+        """
+        Decodes a table into a dict of column arrays, optionally only the rows overlapping [start_ms, end_ms).
+        Dictionary encoded columns hold codes into self.dictionaries, text columns are lists of strings and
+        the extra "row" column is the position of each row in the whole table. Returns None for missing tables.
+        """
+        layout = self.header["tables"].get(name)
+        if layout is None:
+            return None
+        lower = -np.inf if start_ms is None else start_ms
+        upper = np.inf if end_ms is None else end_ms
+        blocks = [block for block in layout["blocks"] if block["end"] >= lower and block["start"] < upper]
+
+        decoded = {column: [] for column in layout["columns"]}
+        decoded["row"] = []
+        for block in blocks:
+            sections = block["columns"]
+            starts = np.cumsum(np.frombuffer(self._read(sections["start"]), dtype="<i4"), dtype=np.int64)
+            for column, kind in layout["columns"].items():
+                if column == "start":
+                    values = starts
+                elif column == "end":
+                    values = starts + np.frombuffer(self._read(sections["end"]), dtype="<i4")
+                elif kind == "text":
+                    lengths = np.frombuffer(self._read(sections[f"{column}:lengths"]), dtype="<u4")
+                    blob = self._read(sections[column]).decode("utf-8")
+                    offsets = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))).tolist()
+                    values = [blob[offsets[i]:offsets[i + 1]] for i in range(len(lengths))]
+                else:
+                    dtype = {"float32": "<f4", "uint32": "<u4"}.get(kind, "<u2")
+                    values = np.frombuffer(self._read(sections[column]), dtype=dtype)
+                decoded[column].append(values)
+            decoded["row"].append(np.arange(block["row_offset"], block["row_offset"] + block["rows"]))
+
+        columns = {}
+        for column, parts in decoded.items():
+            if layout["columns"].get(column) == "text":
+                columns[column] = [text for part in parts for text in part]
+            else:
+                columns[column] = np.concatenate(parts) if parts else np.array([], dtype=np.int64)
+        if start_ms is not None or end_ms is not None:
+            # Blocks are selected by their overall time span, the rows still need to be filtered one by one
+            keep = (columns["end"] >= lower) & (columns["start"] < upper)
+            for column, values in columns.items():
+                columns[column] = [v for v, k in zip(values, keep) if k] if isinstance(values, list) else values[keep]
+        return columns
+
+    def frame(self, name, start_ms=None, end_ms=None):
+        """
+        Same as table(), as a pandas DataFrame with the dictionary encoded columns decoded.
+        """
+        columns = self.table(name, start_ms, end_ms)
+        if columns is None:
+            return None
+        for column, kind in self.header["tables"][name]["columns"].items():
+            if kind in DICTIONARY_COLUMNS:
+                columns[column] = np.array(self.dictionaries[kind], dtype=object)[columns[column]] \
+                    if len(columns[column]) else np.array([], dtype=object)
+        return pd.DataFrame(columns)
+
+    def _rows(self, name, columns):
+        """
+        Turns decoded columns back into the row dicts of transcript_data.
+        """
+        fields = {}
+        for column, kind in self.header["tables"][name]["columns"].items():
+            values = columns[column]
+            if kind in DICTIONARY_COLUMNS:
+                dictionary = self.dictionaries[kind]
+                fields[column] = [dictionary[code] for code in values.tolist()]
+            elif kind == "float32":
+                # The shortest representation of a float32 gives back the values as they were written.
+                # Confidences repeat a lot, so every distinct value is only converted once.
+                distinct, inverse = np.unique(values, return_inverse=True)
+                converted = [None if value == "nan" else float(value) for value in distinct.astype(str)]
+                fields[column] = [converted[i] for i in inverse.tolist()]
+            elif kind == "text":
+                fields[column] = values
+            else:
+                fields[column] = values.tolist()
+        return [dict(zip(fields, row)) for row in zip(*fields.values())]
+
+    def to_transcript_data(self, start_ms=None, end_ms=None):
+        """
+        Rebuilds the transcript_data payload, or the part of it between start_ms and end_ms. A time range keeps
+        the utterances, words, sentiment results and entities overlapping it, the IAB topic segments and content
+        safety results overlapping it, and recomputes the topic summary from those segments.
+        """
+        transcript_data = self.metadata()
+        sliced = start_ms is not None or end_ms is not None
+
+        utterances = self.table("utterances", start_ms, end_ms)
+        # Utterances overlapping the range can have words outside of it, those are decoded as well
+        word_start = start_ms
+        word_end = end_ms
+        if utterances is not None and len(utterances["start"]) and sliced:
+            word_start = min(start_ms if start_ms is not None else np.inf, int(utterances["start"].min()))
+            word_end = max(end_ms if end_ms is not None else -np.inf, int(utterances["end"].max()) + 1)
+        words = self.table("words", word_start, word_end)
+        word_rows = self._rows("words", words) if words is not None else []
+
+        if utterances is not None:
+            utterance_rows = self._rows("utterances", utterances)
+            positions = np.searchsorted(words["row"], utterances["word_start"]).tolist() if words is not None else []
+            for utterance, position in zip(utterance_rows, positions):
+                utterance["words"] = word_rows[position:position + utterance.pop("word_count")]
+                del utterance["word_start"]
+            for utterance in utterance_rows[len(positions):]:
+                del utterance["word_start"], utterance["word_count"]
+                utterance["words"] = []
+            transcript_data["utterances"] = utterance_rows
+
+        if self.header["top_level_words"]:
+            if sliced and words is not None:
+                keep = ((words["end"] >= (start_ms if start_ms is not None else -np.inf)) &
+                        (words["start"] < (end_ms if end_ms is not None else np.inf))).tolist()
+                word_rows = [row for row, k in zip(word_rows, keep) if k]
+            transcript_data["words"] = word_rows
+        elif sliced and transcript_data.get("words"):
+            transcript_data["words"] = [word for word in transcript_data["words"]
+                                        if (start_ms is None or word["end"] >= start_ms)
+                                        and (end_ms is None or word["start"] < end_ms)]
+
+        for name in ("sentiment", "entities"):
+            columns = self.table(name, start_ms, end_ms)
+            if columns is not None:
+                transcript_data[TABLES[name][0]] = self._rows(name, columns)
+
+        if not sliced:
+            transcript_data["text"] = self.text()
+        else:
+            transcript_data["text"] = " ".join(
+                row["text"] for row in (transcript_data.get("words") or transcript_data.get("utterances") or []))
+            _slice_results(transcript_data, start_ms, end_ms)
+        return transcript_data
+
+def _slice_results(transcript_data, start_ms, end_ms):
+    lower = -np.inf if start_ms is None else start_ms
+    upper = np.inf if end_ms is None else end_ms
+
+    def overlaps(result):
+        timestamp = result.get("timestamp") or {}
+        return timestamp.get("end", 0) >= lower and timestamp.get("start", 0) < upper
+
+    topics = transcript_data.get("iab_categories_result")
+    if topics and topics.get("results") is not None:
+        topics["results"] = [result for result in topics["results"] if overlaps(result)]
+        summary = {}
+        for result in topics["results"]:
+            for label in result["labels"]:
+                summary[label["label"]] = summary.get(label["label"], 0) + label["relevance"] / len(topics["results"])
+        topics["summary"] = dict(sorted(summary.items(), key=lambda item: item[1], reverse=True))
+    safety = transcript_data.get("content_safety_labels")
+    if safety and safety.get("results") is not None:
+        # The content safety summary is kept for the whole recording, only the flagged passages are sliced
+        safety["results"] = [result for result in safety["results"] if overlaps(result)]
+
+def load_transcript(path, start_ms=None, end_ms=None):
+    """
+    Loads an archived transcript (or a time range of it) as a transcript_data payload, ready for process_transcription_data.
+    """
+    with TranscriptArchive(path) as archive:
+        return archive.to_transcript_data(start_ms, end_ms)
+
+def compare_with_json(json_path, repeat=3, slice_ms=10 * 60 * 1000):
+    """
+    Archives a transcript JSON file next to a temporary copy and compares file size and load time with the JSON.
+    """
+    archive_path = f"{json_path}.compare{ARCHIVE_EXTENSION}"
+
+    def best_of(function):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - start) * 1000)
+        return round(min(timings), 3)
+
+    def load_json():
+        with open(json_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    transcript_data = load_json()
+    try:
+        archive_bytes = save_transcript(transcript_data, archive_path)
+        with TranscriptArchive(archive_path) as archive:
+            header_ms = best_of(lambda: TranscriptArchive(archive_path).close())
+            table_ms = best_of(lambda: archive.table("utterances"))
+        return {
+            "json_bytes": os.path.getsize(json_path),
+            "archive_bytes": archive_bytes,
+            "compression_ratio": round(os.path.getsize(json_path) / archive_bytes, 2),
+            "json_load_ms": best_of(load_json),
+            "archive_load_ms": best_of(lambda: load_transcript(archive_path)),
+            "archive_open_ms": header_ms,
+            "archive_utterance_table_ms": table_ms,
+            "archive_slice_ms": best_of(lambda: load_transcript(archive_path, 0, slice_ms))
+        }
+    finally:
+        os.remove(archive_path)
+
+def main(argv=None):
+    """
+    Command line entry point, e.g. `python -m src.transcript_store convert data/transcripts/meeting.json`
+    """
+    parser = argparse.ArgumentParser(description="Convert transcripts to and from the SpeakerLens archive format.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = subparsers.add_parser("convert", help="Archive a transcript JSON file")
+    convert_parser.add_argument("path")
+    convert_parser.add_argument("-o", "--output", help=f"Defaults to {ARCHIVE_DIR}/<name>{ARCHIVE_EXTENSION}")
+
+    export_parser = subparsers.add_parser("export", help="Write an archived transcript (or a time range of it) as JSON")
+    export_parser.add_argument("path")
+    export_parser.add_argument("-o", "--output", required=True)
+    export_parser.add_argument("--start", type=float, help="Start of the time range in seconds")
+    export_parser.add_argument("--end", type=float, help="End of the time range in seconds")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare size and load time of a transcript JSON file and its archive")
+    compare_parser.add_argument("path")
+    compare_parser.add_argument("--repeat", type=int, default=3)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        output = args.output or os.path.join(ARCHIVE_DIR, os.path.splitext(os.path.basename(args.path))[0] + ARCHIVE_EXTENSION)
+        with open(args.path, "r", encoding="utf-8") as f:
+            size = save_transcript(json.load(f), output)
+        print(f"Archived {args.path} to {output} ({size / 1024:.1f} KB, was {os.path.getsize(args.path) / 1024:.1f} KB)")
+    elif args.command == "export":
+        start_ms = None if args.start is None else int(args.start * 1000)
+        end_ms = None if args.end is None else int(args.end * 1000)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(load_transcript(args.path, start_ms, end_ms), f)
+        print(f"Transcript written to {args.output}")
+    elif args.command == "compare":
+        print(json.dumps(compare_with_json(args.path, args.repeat), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Tests import the app's modules as `src.*`, the same way the app and the CLIs do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Spans aren't exported while testing, even when the export is turned on in the environment
+os.environ["SPEAKERLENS_TRACE_FILE"] = ""
@@ -0,0 +1,23 @@
+import os
+import time
+from benchmarks.synthetic_transcripts import generate_transcript_data
+
+def transcribe(audio_path, basic=False, preprocess=False, split=False):
+    """
+    Stands in for AssemblyAI in the job service tests. Every call is logged next to the audio file, file
+    names containing "fail" raise and names containing "slow" take a few seconds.
+    """
+    with open(f"{audio_path}.calls", "a", encoding="utf-8") as f:
+        f.write(f"{os.getpid()}\n")
+    name = os.path.basename(audio_path)
+    if "fail" in name:
+        raise RuntimeError("transcription failed")
+    if "slow" in name:
+        time.sleep(3)
+    return generate_transcript_data(hours=0.05, seed=len(name))
+
+def calls(audio_path):
+    if not os.path.exists(f"{audio_path}.calls"):
+        return []
+    with open(f"{audio_path}.calls", "r", encoding="utf-8") as f:
+        return f.read().split()
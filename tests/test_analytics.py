@@ -0,0 +1,56 @@
+import json
+import pytest
+from benchmarks.synthetic_transcripts import generate_transcript_data
+from src import analytics
+from src.assemblyai_processing import process_transcription_data
+from src.conversation_dynamics import conversation_dynamics, dynamics_report
+from src.transcript_store import save_transcript
+
+@pytest.fixture(scope="module")
+def transcript_data():
+    return generate_transcript_data(hours=0.25, speakers=3, entity_rate=0.05, seed=5)
+
+def test_report_matches_dashboard_computations(transcript_data):
+    report = analytics.analyze_transcript(transcript_data)
+    _, speakers, _, entities, sentiment_analysis, topics, content_safety, _ = process_transcription_data(transcript_data)
+    overall, per_speaker = analytics.entity_counts(speakers, entities)
+    speaking_times = analytics.speaking_time_distribution(speakers)
+
+    assert report["id"] == transcript_data["id"]
+    assert list(report["speakers"]) == list(speakers)
+    for speaker, data in speakers.items():
+        assert report["speakers"][speaker] == {
+            "duration": data["duration"],
+            "speaking_time_pct": round(speaking_times[speaker], 2),
+            "top_entities": dict(per_speaker[speaker].most_common(5))
+        }
+    assert report["top_entities"] == dict(overall.most_common(10))
+    assert report["entities_by_type"] == analytics.group_entities(entities)
+    assert report["sentiment"] == analytics.sentiment_distribution(sentiment_analysis)
+    assert report["topics"] == analytics.filter_topics(topics)
+    assert report["content_safety"] == analytics.content_safety_scores(content_safety)
+    assert report["dynamics"] == dynamics_report(
+        conversation_dynamics(transcript_data["utterances"], sentiment_analysis, list(speakers)))
+    assert json.loads(json.dumps(report)) == report
+
+def test_directory_run_writes_one_report_per_meeting(tmp_path):
+    for seed in range(3):
+        with open(tmp_path / f"meeting-{seed}.json", "w", encoding="utf-8") as f:
+            json.dump(generate_transcript_data(hours=0.1, seed=seed), f)
+    save_transcript(generate_transcript_data(hours=0.1, seed=3), str(tmp_path / "meeting-3.sltr"))
+    output = str(tmp_path / "report.json")
+
+    # The second run finds the first run's report in the directory and has to skip it
+    for _ in range(2):
+        analytics.main([str(tmp_path), "-o", output, "--workers", "2"])
+        with open(output, "r", encoding="utf-8") as f:
+            reports = json.load(f)
+        assert [report["file"] for report in reports] == [f"meeting-{seed}{extension}" for seed, extension in
+                                                          [(0, ".json"), (1, ".json"), (2, ".json"), (3, ".sltr")]]
+        assert [report["id"] for report in reports] == [f"synthetic-{seed}" for seed in range(4)]
+
+def test_single_file_that_is_not_a_transcript_is_rejected(tmp_path):
+    path = tmp_path / "report.json"
+    path.write_text("[]")
+    with pytest.raises(ValueError, match="not a transcript"):
+        analytics.analyze_transcript_file(str(path))
@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from src import assemblyai_processing, audio_preprocessing
+
+ORIGINAL_BYTES = 200_000
+PROCESSED_BYTES = 50_000
+
+TRANSCRIPT = {
+    "id": "transcript-1", "status": "completed", "text": "hi there",
+    "utterances": [{"speaker": "A", "start": 0, "end": 500, "text": "hi there",
+                    "words": [{"text": "hi", "start": 0, "end": 200}, {"text": "there", "start": 210, "end": 500}]}],
+    "words": [{"text": "hi", "start": 0, "end": 200}, {"text": "there", "start": 210, "end": 500}],
+    "sentiment_analysis_results": [{"text": "hi there", "start": 0, "end": 500, "sentiment": "POSITIVE"}],
+    "entities": [{"text": "there", "start": 210, "end": 500, "entity_type": "location"}],
+    "iab_categories_result": {"results": [{"text": "hi there", "timestamp": {"start": 0, "end": 500}}], "summary": {}},
+    "content_safety_labels": {"results": [{"text": "hi there", "timestamp": {"start": 0, "end": 500}}], "summary": {}}
+}
+
+class MockAssemblyAI(BaseHTTPRequestHandler):
+    """
+    Local stand-in for the upload and transcript endpoints. Uploads are throttled to
+    server.bytes_per_second, so the time saved by a smaller file can be measured.
+    """
+    def do_GET(self):
+        self._respond(TRANSCRIPT)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path.endswith("/upload"):
+            self.server.uploads.append(body)
+            if self.server.bytes_per_second:
+                time.sleep(len(body) / self.server.bytes_per_second)
+            response = {"upload_url": "https://mock/audio"}
+        else:
+            response = {"id": "transcript-1"}
+        self._respond(response)
+
+    def _respond(self, response):
+        data = json.dumps(response).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockAssemblyAI)
+    server.uploads = []
+    server.bytes_per_second = None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(assemblyai_processing, "ASSEMBLYAI_URL", f"http://127.0.0.1:{server.server_port}/v2")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def reports(monkeypatch):
+    reports = []
+    def report_savings(stats, upload_seconds):
+        reports.append(audio_preprocessing.report_savings(stats, upload_seconds))
+        return reports[-1]
+    monkeypatch.setattr(assemblyai_processing, "report_savings", report_savings)
+    return reports
+
+@pytest.fixture
+def audio(tmp_path):
+    path = tmp_path / "meeting.mp3"
+    path.write_bytes(b"\x02" * ORIGINAL_BYTES)
+    return str(path)
+
+def fake_ffmpeg(monkeypatch, processed_bytes, error=None):
+    """
+    Replaces ffmpeg: the recording starts with 2.5s of silence and encoding writes `processed_bytes` bytes,
+    or fails halfway with `error`. Returns the list of output paths it wrote to.
+    """
+    outputs = []
+    def run_ffmpeg(args):
+        if any(arg.startswith("silencedetect") for arg in args):
+            return "  Duration: 00:01:00.00, start: 0.000000\nsilence_start: 0\nsilence_end: 2.5 | silence_duration: 2.5\n"
+        outputs.append(args[-1])
+        with open(args[-1], "wb") as f:
+            f.write(b"\x01" * processed_bytes)
+        if error:
+            raise RuntimeError(error)
+        return ""
+    monkeypatch.setattr(audio_preprocessing, "_run_ffmpeg", run_ffmpeg)
+    return outputs
+
+def uploaded_bytes(body, byte):
+    # Uploads are multipart encoded, the file contents are the only non-printable bytes in the body
+    return body.count(byte)
+
+def test_upload_size_and_time_savings_are_reported(monkeypatch, server, reports, audio):
+    outputs = fake_ffmpeg(monkeypatch, PROCESSED_BYTES)
+    server.bytes_per_second = 100_000
+    assert assemblyai_processing.submit_audio(audio, basic=True, preprocess=True) == ("transcript-1", 2250)
+
+    [body] = server.uploads
+    assert uploaded_bytes(body, b"\x01") == PROCESSED_BYTES
+    assert uploaded_bytes(body, b"\x02") == 0
+    [report] = reports
+    assert report["original_bytes"] == ORIGINAL_BYTES
+    assert report["processed_bytes"] == PROCESSED_BYTES
+    assert report["bytes_saved"] == ORIGINAL_BYTES - PROCESSED_BYTES
+    assert report["start_offset"] == 2.25
+    # At 100 kB/s, the processed file takes 0.5s to upload and the original would have taken 2s
+    assert report["upload_seconds"] == pytest.approx(0.5, rel=0.5)
+    assert report["upload_seconds_saved"] == pytest.approx(1.5, rel=0.5)
+    assert report["net_seconds_saved"] == pytest.approx(report["upload_seconds_saved"] - report["encode_seconds"], abs=0.002)
+    # The processed file is a temporary file next to nothing else, and it's gone once uploaded
+    assert outputs == [report["path"]]
+    assert not os.path.exists(report["path"])
+    assert os.path.dirname(report["path"]) != os.path.dirname(audio)
+
+def test_concurrent_jobs_write_to_different_files(monkeypatch, audio):
+    fake_ffmpeg(monkeypatch, PROCESSED_BYTES)
+    first, second = audio_preprocessing.preprocess_for_upload(audio), audio_preprocessing.preprocess_for_upload(audio)
+    assert first["path"] != second["path"]
+    for stats in (first, second):
+        os.remove(stats["path"])
+
+def test_timestamps_match_the_original_recording(monkeypatch, server, reports, audio):
+    fake_ffmpeg(monkeypatch, PROCESSED_BYTES)
+    *_, transcript_data = assemblyai_processing.get_audio_intelligence(audio, preprocess=True)
+
+    [utterance] = transcript_data["utterances"]
+    assert (utterance["start"], utterance["end"]) == (2250, 2750)
+    assert [(word["start"], word["end"]) for word in utterance["words"]] == [(2250, 2450), (2460, 2750)]
+    assert [(word["start"], word["end"]) for word in transcript_data["words"]] == [(2250, 2450), (2460, 2750)]
+    assert transcript_data["sentiment_analysis_results"][0]["start"] == 2250
+    assert transcript_data["entities"][0]["start"] == 2460
+    assert transcript_data["iab_categories_result"]["results"][0]["timestamp"] == {"start": 2250, "end": 2750}
+    assert transcript_data["content_safety_labels"]["results"][0]["timestamp"] == {"start": 2250, "end": 2750}
+
+def test_original_is_uploaded_when_processing_does_not_shrink_it(monkeypatch, server, reports, audio, tmp_path):
+    outputs = fake_ffmpeg(monkeypatch, ORIGINAL_BYTES + 1)
+    assemblyai_processing.submit_audio(audio, basic=True, preprocess=True)
+
+    [body] = server.uploads
+    assert uploaded_bytes(body, b"\x02") == ORIGINAL_BYTES
+    assert reports == []
+    assert not (tmp_path / "meeting.preprocessed.mp3").exists()
+    assert not any(os.path.exists(path) for path in outputs)
+
+def test_original_is_uploaded_without_ffmpeg(monkeypatch, server, reports, audio):
+    monkeypatch.setattr(audio_preprocessing, "FFMPEG_BINARY", "speakerlens-missing-ffmpeg")
+    assemblyai_processing.submit_audio(audio, basic=True, preprocess=True)
+
+    [body] = server.uploads
+    assert uploaded_bytes(body, b"\x02") == ORIGINAL_BYTES
+    assert reports == []
+
+def test_original_is_uploaded_when_ffmpeg_fails(monkeypatch, server, reports, audio):
+    outputs = fake_ffmpeg(monkeypatch, 1000, error="ffmpeg failed: Unknown encoder 'libmp3lame'")
+    assert assemblyai_processing.submit_audio(audio, basic=True, preprocess=True) == ("transcript-1", 0)
+
+    [body] = server.uploads
+    assert uploaded_bytes(body, b"\x02") == ORIGINAL_BYTES
+    assert reports == []
+    # The partial output is cleaned up
+    [output] = outputs
+    assert not os.path.exists(output)
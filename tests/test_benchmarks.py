@@ -0,0 +1,41 @@
+from benchmarks.run_benchmarks import compare
+
+def run(timestamp, scales, embedding_size=1536):
+    return {
+        "timestamp": timestamp,
+        "embedding_size": embedding_size,
+        "scales": {
+            scale: {"hours": hours, "benchmarks": {
+                name: {"min_ms": min_ms, "median_ms": median_ms, "repeat": repeat}
+                for name, (min_ms, median_ms, repeat) in benchmarks.items()
+            }}
+            for scale, (hours, benchmarks) in scales.items()
+        }
+    }
+
+def test_only_runs_at_the_same_scale_are_compared():
+    current = run("3", {"1h": (1.0, {"parse": (30.0, 31.0, 5)})})
+    previous_runs = [
+        run("2", {"10min": (1 / 6, {"parse": (5.0, 5.0, 5)})}),
+        run("1", {"1h": (1.0, {"parse": (10.0, 10.0, 5)})}, embedding_size=64),
+        run("0", {"1h": (1.0, {"parse": (20.0, 20.0, 5)})})
+    ]
+    [regression] = compare(current, previous_runs)
+    assert regression["previous_run"] == "0"
+    assert regression["before_ms"] == 20.0
+    assert regression["after_ms"] == 31.0
+
+def test_single_samples_and_noise_are_not_flagged():
+    current = run("1", {"1h": (1.0, {
+        "single": (50.0, 50.0, 1),
+        "noisy": (11.0, 13.0, 5),
+        "sub_millisecond": (0.5, 0.5, 5),
+        "slower": (15.0, 16.0, 5)
+    })})
+    previous = run("0", {"1h": (1.0, {
+        "single": (10.0, 10.0, 1),
+        "noisy": (9.0, 10.0, 5),
+        "sub_millisecond": (0.1, 0.1, 5),
+        "slower": (10.0, 10.0, 5)
+    })})
+    assert [regression["benchmark"] for regression in compare(current, [previous])] == ["slower"]
@@ -0,0 +1,106 @@
+import json
+import math
+import numpy as np
+import pytest
+from benchmarks.synthetic_transcripts import generate_transcript_data
+from src.conversation_dynamics import SENTIMENT_SCORES, conversation_dynamics, dynamics_report
+
+def utterance(speaker, start, end):
+    return {"speaker": speaker, "start": start, "end": end, "text": "..."}
+
+# A holds the floor, B says "mhm" while A is talking, C cuts in before A is done,
+# then A and B answer after 1.5s and 0.5s of silence
+CONVERSATION = [
+    utterance("A", 0, 10000),
+    utterance("B", 3000, 3500),
+    utterance("C", 9000, 15000),
+    utterance("A", 16500, 20000),
+    utterance("B", 20500, 21000)
+]
+
+@pytest.fixture(scope="module")
+def transcript_data():
+    return generate_transcript_data(hours=0.5, speakers=4, seed=11)
+
+def test_turns_overlaps_and_interruptions():
+    dynamics = conversation_dynamics(CONVERSATION)
+    stats = dynamics["speakers"]
+    assert list(stats.index) == ["A", "B", "C"]
+    # The first utterance opens a turn, the backchannel is a turn and an overlap but not an interruption
+    assert stats["turns"].to_dict() == {"A": 2, "B": 2, "C": 1}
+    assert stats["overlaps"].to_dict() == {"A": 0, "B": 1, "C": 1}
+    assert stats["overlap_seconds"].to_dict() == {"A": 0.0, "B": 0.5, "C": 1.0}
+    assert stats["interruptions"].to_dict() == {"A": 0, "B": 0, "C": 1}
+    assert stats["interrupted"].to_dict() == {"A": 1, "B": 0, "C": 0}
+    assert stats["talk_seconds"].to_dict() == {"A": 13.5, "B": 1.0, "C": 6.0}
+    # The backchannel doesn't take the floor from A, so C's overlap is measured against the end of A's utterance
+    assert stats.loc["A", "median_latency_ms"] == 1500
+    assert stats.loc["B", "median_latency_ms"] == 500
+    assert math.isnan(stats.loc["C", "median_latency_ms"])
+    assert dynamics["interruptions"].loc["C", "A"] == 1
+    assert dynamics["interruptions"].to_numpy().sum() == 1
+
+    windows = dynamics["windows"]
+    assert list(windows["turns"]) == [4]
+    assert list(windows["median_latency_ms"]) == [1000]
+
+def test_talk_seconds_match_brute_force(transcript_data):
+    window_ms = 7000
+    dynamics = conversation_dynamics(transcript_data["utterances"], window_ms=window_ms)
+    talk = dynamics["talk_seconds"]
+    expected = np.zeros(talk.shape)
+    for item in transcript_data["utterances"]:
+        column = list(talk.columns).index(item["speaker"])
+        for row in range(len(talk)):
+            window_start, window_end = row * window_ms, (row + 1) * window_ms
+            expected[row, column] += max(0, min(item["end"], window_end) - max(item["start"], window_start)) / 1000
+    np.testing.assert_allclose(talk.to_numpy(), expected)
+
+def test_rolling_sentiment_matches_brute_force(transcript_data):
+    window_ms, rolling_windows = 45 * 1000, 3
+    results = transcript_data["sentiment_analysis_results"]
+    dynamics = conversation_dynamics(transcript_data["utterances"], results, window_ms=window_ms,
+                                     rolling_windows=rolling_windows)
+    sentiment = dynamics["sentiment"]
+    window_count = len(sentiment)
+
+    def rolling(speaker, window):
+        total = weight = 0.0
+        for result in results:
+            result_window = min((result["start"] + result["end"]) // 2 // window_ms, window_count - 1)
+            if window - rolling_windows < result_window <= window and speaker in (None, result["speaker"]):
+                total += SENTIMENT_SCORES[result["sentiment"]] * result["confidence"]
+                weight += result["confidence"]
+        return total / weight if weight else np.nan
+
+    for speaker in sentiment.columns:
+        expected = [rolling(speaker, window) for window in range(window_count)]
+        np.testing.assert_allclose(sentiment[speaker].to_numpy(), expected)
+    expected = [rolling(None, window) for window in range(window_count)]
+    np.testing.assert_allclose(dynamics["overall_sentiment"].to_numpy(), expected)
+
+def test_empty_input():
+    dynamics = conversation_dynamics([], [])
+    assert dynamics["speakers"].empty
+    assert list(dynamics["windows"]["turns"]) == [0]
+    assert dynamics["overall_sentiment"].isna().all()
+    assert dynamics_report(dynamics)["speakers"] == {}
+
+def test_speakers_not_in_the_list_are_left_out():
+    dynamics = conversation_dynamics(CONVERSATION, speakers=["A", "B", "D"])
+    stats = dynamics["speakers"]
+    assert list(stats.index) == ["A", "B", "D"]
+    assert list(dynamics["talk_seconds"].columns) == ["A", "B", "D"]
+    assert stats["talk_seconds"].to_dict() == {"A": 13.5, "B": 1.0, "D": 0.0}
+    # C's utterance still holds the floor, so A speaking after it isn't counted as a turn
+    assert stats["turns"].to_dict() == {"A": 1, "B": 2, "D": 0}
+    assert stats["interrupted"].sum() == 0
+    assert dynamics["interruptions"].to_numpy().sum() == 0
+
+def test_report_is_json_serializable(transcript_data):
+    dynamics = conversation_dynamics(transcript_data["utterances"], transcript_data["sentiment_analysis_results"])
+    report = dynamics_report(dynamics)
+    # allow_nan=False: missing values have to come out as null
+    assert json.loads(json.dumps(report, allow_nan=False)) == report
+    assert set(report["speakers"]) == set(dynamics["speakers"].index)
+    assert len(report["windows"]["minute"]) == len(dynamics["windows"])
@@ -0,0 +1,37 @@
+import pytest
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from benchmarks.run_benchmarks import FakeLLM
+from benchmarks.synthetic_transcripts import generate_transcript_data
+from src.corpus_index import CorpusIndex
+from src.rag_system import TranscriptRAG
+
+@pytest.fixture
+def index(tmp_path):
+    rag = TranscriptRAG(embeddings=DeterministicFakeEmbedding(size=32), llm=FakeLLM())
+    index = CorpusIndex(str(tmp_path), rag=rag)
+    for i, date in enumerate(["2024-01-31", "2024-03-15"]):
+        index.add_transcript(f"meeting-{i}", generate_transcript_data(hours=0.1, seed=i), date=date)
+    return index
+
+def test_list_and_remove_without_api_key(index, tmp_path, monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    reopened = CorpusIndex(str(tmp_path))
+    assert list(reopened.list_meetings()) == ["meeting-0", "meeting-1"]
+    reopened.remove_meeting("meeting-0")
+    assert list(reopened.list_meetings()) == ["meeting-1"]
+    assert reopened._rag is None
+
+def test_search_by_date_range(index):
+    results = index.search("budget", k=50, date_from="2024-03-01")
+    assert results
+    assert {result["metadata"]["meeting_id"] for result in results} == {"meeting-1"}
+
+@pytest.mark.parametrize("date", ["2024/01/31", "2024-13-01", "31-01-2024", ""])
+def test_invalid_dates_are_rejected(index, date):
+    with pytest.raises(ValueError):
+        CorpusIndex.build_filter(date_to=date)
+    with pytest.raises(ValueError):
+        index.add_meeting("meeting-2", "Some text", {"A": {"text": "Some text", "duration": 1}}, date=date or "-")
+    with pytest.raises(ValueError):
+        index.append_to_meeting("live", "Some text", {"A": {"text": "Some text", "duration": 1}}, date=date or "-")
+    assert list(index.list_meetings()) == ["meeting-0", "meeting-1"]
@@ -0,0 +1,62 @@
+import pytest
+from benchmarks.synthetic_transcripts import generate_transcript_data
+from src import analytics
+from src.assemblyai_processing import aggregate_speakers, process_transcription_data
+from src.incremental import IncrementalTranscript, LocalSegmentSource
+
+@pytest.fixture(scope="module")
+def transcript_data():
+    # A high entity rate makes ties in the entity counts likely
+    transcript_data = generate_transcript_data(hours=0.5, speakers=5, entity_rate=0.05, seed=7)
+    transcript_data["text"] = " ".join(utterance["text"] for utterance in transcript_data["utterances"])
+    return transcript_data
+
+@pytest.mark.parametrize("segment_ms", [30 * 1000, 5 * 60 * 1000, 60 * 60 * 1000])
+def test_streamed_statistics_match_batch(transcript_data, segment_ms):
+    incremental = IncrementalTranscript().ingest(LocalSegmentSource(transcript_data, segment_ms))
+    transcription, speakers, _, entities, sentiment_analysis, *_ = process_transcription_data(transcript_data)
+
+    assert incremental.transcription == transcription
+    assert incremental.speakers == speakers
+    assert list(incremental.speakers) == list(speakers)
+    assert incremental.entities == entities
+    assert incremental.sentiment_analysis == sentiment_analysis
+    assert incremental.sentiment_distribution() == analytics.sentiment_distribution(sentiment_analysis)
+    assert analytics.speaking_time_distribution(incremental.speakers) == analytics.speaking_time_distribution(speakers)
+
+    overall, per_speaker = incremental.entity_counts()
+    batch_overall, batch_per_speaker = analytics.entity_counts(speakers, entities)
+    # Same counts in the same order, so most_common() picks the same entities when counts are tied
+    assert list(overall.items()) == list(batch_overall.items())
+    assert overall.most_common(10) == batch_overall.most_common(10)
+    assert list(per_speaker) == list(batch_per_speaker)
+    for speaker, counts in per_speaker.items():
+        assert list(counts.items()) == list(batch_per_speaker[speaker].items())
+        assert counts.most_common(5) == batch_per_speaker[speaker].most_common(5)
+
+    result = incremental.result()
+    assert result[:5] == (transcription, speakers, "No summary available.", entities, sentiment_analysis)
+
+def test_transcription_follows_appended_batches(transcript_data):
+    incremental = IncrementalTranscript()
+    batches = list(LocalSegmentSource(transcript_data, 60 * 1000))
+    incremental.append(batches[0])
+    first = incremental.transcription
+    assert incremental.transcription is first
+    incremental.append(batches[1])
+    assert incremental.transcription == " ".join(
+        utterance["text"] for batch in batches[:2] for utterance in batch["utterances"])
+
+def test_speakers_follow_appended_batches(transcript_data):
+    incremental = IncrementalTranscript()
+    batches = list(LocalSegmentSource(transcript_data, 60 * 1000))
+    incremental.append(batches[0])
+    first = incremental.speakers
+    assert first == aggregate_speakers(batches[0]["utterances"])
+
+    incremental.append({"utterances": [dict(batches[1]["utterances"][0], speaker="New")]})
+    # Only the speakers the batch added to are joined again
+    assert all(incremental.speakers[speaker]["text"] is first[speaker]["text"] for speaker in first)
+    incremental.append(batches[1])
+    assert incremental.speakers == aggregate_speakers(
+        batches[0]["utterances"] + [dict(batches[1]["utterances"][0], speaker="New")] + batches[1]["utterances"])
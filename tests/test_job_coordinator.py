@@ -0,0 +1,149 @@
+import time
+import sqlite3
+import threading
+import pytest
+from src import job_coordinator
+from src.job_coordinator import TranscriptionCoordinator, hash_audio
+
+class FakeAssemblyAI:
+    """
+    Stands in for submit_audio/poll_transcription_status, counting the uploads and the polled transcript IDs.
+    """
+    def __init__(self, poll_seconds=0.5, fail=False):
+        self.poll_seconds = poll_seconds
+        self.fail = fail
+        self.lock = threading.Lock()
+        self.submitted = []
+        self.polled = []
+        self.offsets = {}
+
+    def submit_audio(self, file_path, basic=False, preprocess=False):
+        with self.lock:
+            self.submitted.append((file_path, preprocess))
+            return f"transcript-{len(self.submitted)}", 0
+
+    def poll_transcription_status(self, transcript_id, start_offset_ms=0):
+        with self.lock:
+            self.polled.append(transcript_id)
+            self.offsets[transcript_id] = start_offset_ms
+        time.sleep(self.poll_seconds)
+        if self.fail:
+            raise RuntimeError("upload rejected")
+        return {"id": transcript_id, "text": "hello", "utterances": [], "words": []}
+
+@pytest.fixture
+def assemblyai(monkeypatch):
+    fake = FakeAssemblyAI()
+    monkeypatch.setattr(job_coordinator, "submit_audio", fake.submit_audio)
+    monkeypatch.setattr(job_coordinator, "poll_transcription_status", fake.poll_transcription_status)
+    return fake
+
+@pytest.fixture
+def audio(tmp_path):
+    path = tmp_path / "meeting.mp3"
+    path.write_bytes(b"fake audio")
+    return str(path)
+
+def coordinator(tmp_path, **kwargs):
+    # One coordinator per simulated session, each with its own owner ID
+    kwargs.setdefault("wait_seconds", 0.05)
+    return TranscriptionCoordinator(str(tmp_path / "jobs.db"), str(tmp_path / "transcripts"), **kwargs)
+
+def run_sessions(tmp_path, audio, sessions, **kwargs):
+    results, errors = [], []
+    def session():
+        try:
+            results.append(coordinator(tmp_path).get_transcript(audio, **kwargs))
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=session) for _ in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+def insert_job(tmp_path, audio, mode, status, transcript_id=None, heartbeat=None, error=None, start_offset_ms=None):
+    # A job owned by another session (or a crashed one, depending on the heartbeat)
+    session = coordinator(tmp_path)
+    with session._connect() as connection:
+        connection.execute(
+            "INSERT INTO transcription_jobs (audio_hash, mode, status, transcript_id, owner, heartbeat, error, "
+            "created_at, start_offset_ms) VALUES (?, ?, ?, ?, 'other-session', ?, ?, ?, ?)",
+            (hash_audio(audio), mode, status, transcript_id, heartbeat, error, time.time(), start_offset_ms)
+        )
+
+def test_concurrent_sessions_transcribe_once(tmp_path, audio, assemblyai):
+    results, errors = run_sessions(tmp_path, audio, 5)
+    assert not errors
+    assert len(assemblyai.submitted) == 1
+    assert results == [results[0]] * 5
+
+    # Later requests are served from the stored result
+    assert coordinator(tmp_path).get_transcript(audio) == results[0]
+    assert len(assemblyai.submitted) == 1
+
+def test_failure_is_raised_to_every_waiting_session(tmp_path, audio, assemblyai):
+    assemblyai.fail = True
+    results, errors = run_sessions(tmp_path, audio, 4)
+    assert not results
+    assert len(errors) == 4
+    assert all("upload rejected" in str(e) for e in errors)
+    # The waiting sessions didn't resubmit one after the other
+    assert len(assemblyai.submitted) == 1
+
+    # A request made after the failure retries it
+    assemblyai.fail = False
+    assert coordinator(tmp_path).get_transcript(audio)["id"] == "transcript-2"
+    assert len(assemblyai.submitted) == 2
+
+def test_stale_job_is_resumed_without_resubmitting(tmp_path, audio, assemblyai):
+    insert_job(tmp_path, audio, "features", "polling", "transcript-old", heartbeat=time.time() - 120)
+    session = coordinator(tmp_path)
+    assert [job["transcript_id"] for job in session.pending_jobs()] == ["transcript-old"]
+
+    assert session.get_transcript(audio)["id"] == "transcript-old"
+    assert assemblyai.submitted == []
+    assert assemblyai.polled == ["transcript-old"]
+    assert session.pending_jobs() == []
+
+def test_resumed_job_keeps_the_start_offset(tmp_path, audio, assemblyai):
+    insert_job(tmp_path, audio, "features-preprocessed", "polling", "transcript-old",
+               heartbeat=time.time() - 120, start_offset_ms=2250)
+    coordinator(tmp_path).get_transcript(audio, preprocess=True)
+    assert assemblyai.offsets == {"transcript-old": 2250}
+
+def test_start_offset_column_is_added_to_existing_tables(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    with sqlite3.connect(db_path) as connection:
+        connection.execute(
+            "CREATE TABLE transcription_jobs (audio_hash TEXT NOT NULL, mode TEXT NOT NULL, status TEXT NOT NULL, "
+            "transcript_id TEXT, owner TEXT, heartbeat REAL, result_path TEXT, error TEXT, created_at REAL, "
+            "PRIMARY KEY (audio_hash, mode))"
+        )
+    session = TranscriptionCoordinator(db_path, str(tmp_path / "transcripts"))
+    with session._connect() as connection:
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(transcription_jobs)")}
+    assert "start_offset_ms" in columns
+
+def test_running_job_is_not_taken_over(tmp_path, audio, assemblyai):
+    insert_job(tmp_path, audio, "features", "polling", "transcript-other", heartbeat=time.time())
+    results = []
+    waiting = threading.Thread(target=lambda: results.append(coordinator(tmp_path).get_transcript(audio)))
+    waiting.start()
+    time.sleep(0.3)
+    assert results == []
+
+    # The other session finishes the job, the waiting one picks up its result
+    owner = coordinator(tmp_path)
+    owner.owner = "other-session"
+    owner._run({"transcript_id": "transcript-other"}, hash_audio(audio), "features", audio, False, False, False)
+    waiting.join(timeout=10)
+    assert results[0]["id"] == "transcript-other"
+    assert assemblyai.submitted == []
+
+def test_preprocessing_is_part_of_the_job_key(tmp_path, audio, assemblyai):
+    coordinator(tmp_path).get_transcript(audio)
+    coordinator(tmp_path).get_transcript(audio, preprocess=True)
+    coordinator(tmp_path).get_transcript(audio, preprocess=True)
+    assert assemblyai.submitted == [(audio, False), (audio, True)]
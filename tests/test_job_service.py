@@ -0,0 +1,150 @@
+import time
+import sqlite3
+import pytest
+from src.job_service import JobQueue, JobService, run_worker
+from tests import fake_providers
+
+PROVIDER = "tests.fake_providers:transcribe"
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "queue.db"), str(tmp_path / "jobs"))
+
+def audio_file(tmp_path, name):
+    path = tmp_path / name
+    path.write_bytes(b"fake audio")
+    return str(path)
+
+def wait_for(queue, job_ids, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        jobs = [queue.get(job_id) for job_id in job_ids]
+        if all(job["status"] in ("completed", "failed") for job in jobs):
+            return jobs
+        time.sleep(0.1)
+    raise TimeoutError("jobs did not finish in time")
+
+def test_status_lookup(queue, tmp_path):
+    job_id = queue.submit(audio_file(tmp_path, "meeting.mp3"), preprocess=True)
+    job = queue.get(job_id)
+    assert job["status"] == "queued"
+    assert job["stage"] == "queued"
+    assert job["options"] == {"basic": False, "preprocess": True, "split": False}
+    assert queue.get("missing") is None
+    assert queue.load_result(job_id) is None
+
+    claimed = queue.claim_next("worker-1")
+    assert claimed["id"] == job_id
+    assert queue.get(job_id)["status"] == "running"
+    assert queue.get(job_id)["worker"] == "worker-1"
+    assert queue.claim_next("worker-2") is None
+
+def test_jobs_complete_across_workers(queue, tmp_path):
+    paths = [audio_file(tmp_path, f"meeting-{i}.mp3") for i in range(6)]
+    job_ids = [queue.submit(path) for path in paths]
+    service = JobService(3, queue.db_path, queue.results_dir, PROVIDER, index=False, idle_seconds=0.05).start()
+    try:
+        jobs = wait_for(queue, job_ids)
+    finally:
+        service.stop()
+
+    assert all(job["status"] == "completed" for job in jobs)
+    assert len({job["worker"] for job in jobs}) > 1
+    for path, job in zip(paths, jobs):
+        # Every job ran exactly once and its transcript can be loaded by the app
+        assert len(fake_providers.calls(path)) == 1
+        assert queue.load_result(job["id"])["utterances"]
+
+def test_failures_are_recorded(queue, tmp_path):
+    failing = queue.submit(audio_file(tmp_path, "fail.mp3"))
+    working = queue.submit(audio_file(tmp_path, "meeting.mp3"))
+    run_worker(queue.db_path, queue.results_dir, PROVIDER, index=False, idle_seconds=0.05, max_jobs=2)
+
+    failed = queue.get(failing)
+    assert failed["status"] == "failed"
+    assert "transcription failed" in failed["error"]
+    assert queue.load_result(failing) is None
+    assert queue.get(working)["status"] == "completed"
+
+def test_crashed_worker_job_is_requeued(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.db"), str(tmp_path / "jobs"), stale_after=0.5)
+    path = audio_file(tmp_path, "meeting.mp3")
+    job_id = queue.submit(path)
+    # A worker claims the job and dies without ever sending a heartbeat
+    queue.claim_next("crashed-worker")
+    assert queue.claim_next("worker-2") is None
+
+    time.sleep(0.6)
+    run_worker(queue.db_path, queue.results_dir, PROVIDER, index=False, max_jobs=1, stale_after=0.5)
+    job = queue.get(job_id)
+    assert job["status"] == "completed"
+    assert job["worker"] != "crashed-worker"
+
+def test_killed_worker_process_job_is_requeued(queue, tmp_path):
+    path = audio_file(tmp_path, "slow.mp3")
+    job_id = queue.submit(path)
+    service = JobService(1, queue.db_path, queue.results_dir, PROVIDER, index=False, idle_seconds=0.05).start()
+    while queue.get(job_id)["status"] != "running":
+        time.sleep(0.05)
+    service.stop()  # Kills the worker in the middle of the job
+
+    time.sleep(0.6)
+    run_worker(queue.db_path, queue.results_dir, PROVIDER, index=False, max_jobs=1, stale_after=0.5)
+    assert queue.get(job_id)["status"] == "completed"
+    assert len(fake_providers.calls(path)) == 2
+
+def test_heartbeat_keeps_long_jobs_from_being_requeued(queue, tmp_path):
+    path = audio_file(tmp_path, "slow.mp3")
+    job_id = queue.submit(path)
+    # The job takes far longer than stale_after, but its heartbeat keeps the second worker away from it
+    service = JobService(2, queue.db_path, queue.results_dir, PROVIDER, index=False, idle_seconds=0.05,
+                         heartbeat_seconds=0.1, stale_after=0.5).start()
+    try:
+        wait_for(queue, [job_id])
+    finally:
+        service.stop()
+    assert queue.get(job_id)["status"] == "completed"
+    assert len(fake_providers.calls(path)) == 1
+
+def test_requeued_job_is_not_finished_by_its_old_worker(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.db"), str(tmp_path / "jobs"), stale_after=0.2)
+    job_id = queue.submit(audio_file(tmp_path, "meeting.mp3"))
+    queue.claim_next("stalled-worker")
+    time.sleep(0.3)
+    assert queue.claim_next("worker-2")["id"] == job_id
+
+    # The first worker comes back to life and tries to record its outcome
+    queue._update(job_id, "stalled-worker", heartbeat=time.time())
+    queue._update(job_id, "stalled-worker", status="failed", stage="failed", error="timed out")
+    job = queue.get(job_id)
+    assert (job["status"], job["worker"], job["error"]) == ("running", "worker-2", None)
+
+    queue._update(job_id, "worker-2", status="completed", stage="completed")
+    assert queue.get(job_id)["status"] == "completed"
+
+def test_job_that_keeps_killing_its_worker_fails(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.db"), str(tmp_path / "jobs"), stale_after=0.2, max_attempts=2)
+    job_id = queue.submit(audio_file(tmp_path, "meeting.mp3"))
+    for attempt in (1, 2):
+        assert queue.claim_next(f"worker-{attempt}")["attempts"] == attempt
+        time.sleep(0.3)  # The worker dies without sending a heartbeat
+
+    assert queue.claim_next("worker-3") is None
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["attempts"] == 2
+    assert "2 times" in job["error"]
+
+def test_attempts_column_is_added_to_existing_queues(tmp_path):
+    db_path = str(tmp_path / "queue.db")
+    with sqlite3.connect(db_path) as connection:
+        connection.execute(
+            "CREATE TABLE jobs (id TEXT PRIMARY KEY, audio_path TEXT NOT NULL, options TEXT NOT NULL, "
+            "status TEXT NOT NULL, stage TEXT, worker TEXT, heartbeat REAL, error TEXT, created_at REAL NOT NULL, "
+            "started_at REAL, finished_at REAL)"
+        )
+        connection.execute("INSERT INTO jobs (id, audio_path, options, status, stage, created_at) "
+                           "VALUES ('old', 'meeting.mp3', '{}', 'queued', 'queued', 0)")
+    queue = JobQueue(db_path, str(tmp_path / "jobs"))
+    assert queue.claim_next("worker-1")["attempts"] == 1
+    assert queue.get("old")["attempts"] == 1
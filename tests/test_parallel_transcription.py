@@ -0,0 +1,104 @@
+import os
+import pytest
+from src import assemblyai_processing, audio_preprocessing, parallel_transcription
+from src.parallel_transcription import LAST_SEGMENT_FRACTION, SEGMENT_SECONDS, merge_transcripts, plan_segments
+
+def utterance(speaker, start_s, end_s):
+    # One word per second
+    words = [{"text": f"w{second}", "start": second * 1000, "end": second * 1000 + 900, "confidence": 0.9,
+              "speaker": speaker} for second in range(start_s, end_s)]
+    return {"speaker": speaker, "start": start_s * 1000, "end": end_s * 1000 - 100, "confidence": 0.9,
+            "text": " ".join(word["text"] for word in words), "words": words}
+
+def local(item, offset_s):
+    # Timestamps as the job of a segment starting at offset_s reports them
+    shifted = dict(item, start=item["start"] - offset_s * 1000, end=item["end"] - offset_s * 1000)
+    shifted["words"] = [dict(word, start=word["start"] - offset_s * 1000, end=word["end"] - offset_s * 1000)
+                        for word in item["words"]]
+    return shifted
+
+def relabel(item, speaker):
+    return dict(item, speaker=speaker, words=[dict(word, speaker=speaker) for word in item["words"]])
+
+def test_single_job_cutoff():
+    single_job_seconds = SEGMENT_SECONDS * (1 + LAST_SEGMENT_FRACTION)
+    assert len(plan_segments(single_job_seconds, [])) == 1
+    assert len(plan_segments(single_job_seconds + 1, [])) == 2
+
+def test_utterances_crossing_a_cut_keep_their_words():
+    # Nobody pauses near the cut at 100s: B talks from 80s to 115s
+    conversation = [utterance("A", 0, 30), utterance("A", 40, 70), utterance("B", 80, 115), utterance("A", 120, 140)]
+    segments = [(0.0, 0.0, 100.0), (40.0, 100.0, 140.0)]
+    first = [conversation[0], conversation[1], utterance("B", 80, 100)]  # The audio stops at the cut
+    second = [relabel(local(conversation[1], 40), "X"), relabel(local(conversation[2], 40), "Y"),
+              relabel(local(conversation[3], 40), "X")]
+    merged = merge_transcripts([{"id": "1", "utterances": first}, {"id": "2", "utterances": second}], segments)
+
+    assert merged["utterances"] == conversation
+    assert merged["words"] == [word for u in conversation for word in u["words"]]
+    assert merged["text"] == " ".join(u["text"] for u in conversation)
+
+def test_crossing_utterance_of_a_speaker_without_a_cut_off_one():
+    # The first segment's audio stopped before B's first word was recognised
+    segments = [(0.0, 0.0, 100.0), (40.0, 100.0, 140.0)]
+    first = [utterance("A", 0, 30), utterance("A", 40, 70)]
+    second = [local(utterance("A", 40, 70), 40), local(utterance("B", 99, 115), 40)]
+    merged = merge_transcripts([{"id": "1", "utterances": first}, {"id": "2", "utterances": second}], segments)
+
+    crossing = merged["utterances"][-1]
+    assert crossing["start"] == 100 * 1000
+    assert [word["text"] for word in crossing["words"]] == [f"w{second}" for second in range(100, 115)]
+    assert len(merged["words"]) == 30 + 30 + 15
+
+@pytest.fixture
+def audio(tmp_path):
+    path = tmp_path / "meeting.mp3"
+    path.write_bytes(b"\x02" * 200_000)
+    return str(path)
+
+def test_single_job_without_ffmpeg(monkeypatch, audio):
+    monkeypatch.setattr(audio_preprocessing, "FFMPEG_BINARY", "speakerlens-missing-ffmpeg")
+    submitted = []
+    monkeypatch.setattr(parallel_transcription, "submit_audio",
+                        lambda *args: submitted.append(args) or ("transcript-1", 0))
+    monkeypatch.setattr(parallel_transcription, "poll_transcription_status",
+                        lambda transcript_id, start_offset_ms: {"id": transcript_id, "utterances": []})
+
+    assert parallel_transcription.transcribe_parallel(audio, preprocess=True)["id"] == "transcript-1"
+    assert submitted == [(audio, False, True)]
+
+def test_split_preprocessed_recording(monkeypatch, audio):
+    # 10 minute recording starting with 2.5s of silence, compressed to a quarter of its size
+    def run_ffmpeg(args):
+        if any(arg.startswith("silencedetect") for arg in args):
+            return "  Duration: 00:10:00.00, start: 0.000000\nsilence_start: 0\nsilence_end: 2.5 | silence_duration: 2.5\n"
+        with open(args[-1], "wb") as f:
+            f.write(b"\x01" * 50_000)
+        return ""
+    monkeypatch.setattr(audio_preprocessing, "_run_ffmpeg", run_ffmpeg)
+    reports = []
+    monkeypatch.setattr(assemblyai_processing, "report_savings", lambda stats, seconds: reports.append(stats))
+
+    extracted = []
+    def extract_segment(file_path, start, end, output_path):
+        extracted.append((file_path, start, end))
+        return output_path
+    monkeypatch.setattr(parallel_transcription, "extract_segment", extract_segment)
+    monkeypatch.setattr(parallel_transcription, "upload_audio", lambda path: path)
+    def transcribe_segment(audio_url, basic, segment):
+        # Every segment has one utterance, starting a second after its own part of the (processed) audio
+        audio_start, own_start, _ = segments[segment]
+        return {"id": str(segment), "utterances": [local(utterance("A", int(own_start) + 1, int(own_start) + 3), audio_start)]}
+    monkeypatch.setattr(parallel_transcription, "transcribe_segment", transcribe_segment)
+    segments = plan_segments(597.75, [], 200, 30)
+
+    merged = parallel_transcription.transcribe_parallel(audio, preprocess=True, segment_seconds=200, overlap_seconds=30)
+
+    [stats] = reports
+    # The processed file is split, the segments are planned on its timeline and it's deleted afterwards
+    assert {file_path for file_path, _, _ in extracted} == {stats["path"]}
+    assert [(start, end) for _, start, end in extracted] == [(start, end) for start, _, end in segments]
+    assert not os.path.exists(stats["path"])
+    # The timestamps are shifted back by the 2.25s of silence trimmed at the start
+    assert [u["start"] for u in merged["utterances"]] == [1000 + 2250, 201000 + 2250, 401000 + 2250]
+    assert merged["words"][0]["start"] == 1000 + 2250
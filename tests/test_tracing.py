@@ -0,0 +1,85 @@
+import os
+import json
+import pytest
+from src import tracing
+from src.tracing import recent_spans, set_trace_file, span, traced
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    set_trace_file(path)
+    yield path
+    set_trace_file(None)
+
+def read_spans(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_spans_nest():
+    with span("outer", bytes=10) as outer:
+        with span("inner") as inner:
+            inner.set(cache="hit")
+    assert inner.parent_id == outer.span_id
+    assert inner.trace_id == outer.trace_id
+    assert outer.parent_id is None
+    # Children finish first
+    spans = recent_spans(outer.trace_id)
+    assert [s["name"] for s in spans] == ["inner", "outer"]
+    assert spans[0]["attributes"] == {"cache": "hit"}
+    assert spans[1]["attributes"] == {"bytes": 10}
+    assert spans[1]["duration_ms"] >= spans[0]["duration_ms"]
+
+def test_traced_names_the_span_and_records_errors():
+    @traced()
+    def transcribe():
+        raise RuntimeError("upload rejected")
+
+    @traced("custom_name")
+    def process():
+        return 42
+
+    with span("root") as root:
+        assert process() == 42
+        with pytest.raises(RuntimeError):
+            transcribe()
+    spans = {s["name"]: s for s in recent_spans(root.trace_id)}
+    assert spans["custom_name"]["parent_id"] == root.span_id
+    assert spans["transcribe"]["attributes"]["error"] == "RuntimeError('upload rejected')"
+
+def test_export_can_be_turned_on_and_off(trace_file):
+    with span("exported"):
+        pass
+    set_trace_file(None)
+    with span("not_exported"):
+        pass
+    assert [s["name"] for s in read_spans(trace_file)] == ["exported"]
+
+def test_file_is_rotated(trace_file, monkeypatch):
+    monkeypatch.setattr(tracing, "MAX_TRACE_FILE_BYTES", 1000)
+    for i in range(30):
+        with span("stage", index=i):
+            pass
+    rotated = read_spans(f"{trace_file}.1")
+    current = read_spans(trace_file)
+    assert os.path.getsize(f"{trace_file}.1") >= 1000
+    assert os.path.getsize(trace_file) < 1000
+    # The current file carries on where the rotated one stopped
+    assert current[0]["attributes"]["index"] == rotated[-1]["attributes"]["index"] + 1
+    assert current[-1]["attributes"]["index"] == 29
+
+def test_rotation_by_another_process_is_not_repeated(trace_file, monkeypatch):
+    monkeypatch.setattr(tracing, "MAX_TRACE_FILE_BYTES", 1000)
+    with span("before", index=0):
+        pass
+    # Another process sharing the file fills it up, rotates it and starts a new one
+    with open(trace_file, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"name": "other", "padding": "x" * 1000}) + "\n")
+    os.replace(trace_file, f"{trace_file}.1")
+    with open(trace_file, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"name": "other"}) + "\n")
+
+    # This process notices and writes to the new file, without rotating it over the spans just rotated
+    with span("after"):
+        pass
+    assert [s["name"] for s in read_spans(f"{trace_file}.1")] == ["before", "other"]
+    assert [s["name"] for s in read_spans(trace_file)] == ["other", "after"]
@@ -0,0 +1,37 @@
+import pytest
+from benchmarks.synthetic_transcripts import generate_transcript_data
+from src.transcript_store import save_transcript, load_transcript
+
+def word(text, start, end, speaker):
+    return {"text": text, "start": start, "end": end, "confidence": 0.9, "speaker": speaker}
+
+UTTERANCES = [
+    {"confidence": 0.9, "end": 500, "speaker": "A", "start": 0, "text": "hi there",
+     "words": [word("hi", 0, 200, "A"), word("there", 210, 500, "A")]},
+    {"confidence": 0.9, "end": 700, "speaker": "B", "start": 600, "text": "yes", "words": [word("yes", 600, 700, "B")]}
+]
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "meeting.sltr")
+
+def test_round_trip(path):
+    transcript_data = generate_transcript_data(hours=0.1, seed=3)
+    save_transcript(transcript_data, path)
+    assert load_transcript(path) == transcript_data
+
+@pytest.mark.parametrize("words", [
+    [],
+    [word("hi", 0, 200, "A"), word("there", 210, 500, "A")],
+    [word("hello", 0, 200, "A"), word("there", 210, 500, "A"), word("yes", 600, 700, "B")]
+], ids=["empty", "missing-utterance-words", "different-words"])
+def test_top_level_words_are_kept_as_they_are(path, words):
+    # Top-level words that don't contain the words of every utterance can't be linked by position
+    transcript_data = {"text": "hi there yes", "words": words, "utterances": UTTERANCES}
+    save_transcript(transcript_data, path)
+    assert load_transcript(path) == transcript_data
+    assert load_transcript(path, 550, 800)["utterances"] == UTTERANCES[1:]
+
+def test_missing_words_stay_missing(path):
+    save_transcript({"text": "hi there yes", "utterances": UTTERANCES}, path)
+    assert "words" not in load_transcript(path)